@@ -0,0 +1,61 @@
+from posts.models import Comment, Post
+
+# Поле ответа -> выражение для values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+}
+RESOURCE_FIELDS = {
+    Post: POST_FIELDS,
+    Comment: COMMENT_FIELDS,
+}
+# Без них не построить курсор следующей страницы.
+CURSOR_FIELDS = ('id', 'pub_date')
+
+
+class FieldsError(ValueError):
+    """В ?fields= запрошено неизвестное поле."""
+
+
+def parse_fields(model, raw):
+    """Список полей ответа из параметра ?fields=; пустой — все поля."""
+    available = RESOURCE_FIELDS[model]
+    if not raw:
+        return list(available)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise FieldsError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(available)}.'
+        )
+    return fields
+
+
+def select_values(queryset, fields):
+    """values() по полям ответа и полям курсора."""
+    available = RESOURCE_FIELDS[queryset.model]
+    lookups = dict.fromkeys(
+        available[name] for name in (*CURSOR_FIELDS, *fields)
+    )
+    return queryset.values(*lookups)
+
+
+def serialize(model, row, fields):
+    """Строка values() в словарь ответа."""
+    available = RESOURCE_FIELDS[model]
+    return {name: row[available[name]] for name in fields}
@@ -0,0 +1,148 @@
+import json
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import CURSOR_NEXT, encode_cursor
+
+from ..views import PAGE_SIZE
+
+User = get_user_model()
+
+
+class ApiViewsTest(TestCase):
+    """Класс для тестирования JSON API."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='bimo')
+        cls.author = User.objects.create_user(username='jake')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(PAGE_SIZE + 5):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+        cls.post = Post.objects.create(author=cls.user, text='Другой пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def collect(self, client, url, **params):
+        """Проходит все страницы по ссылкам next."""
+        results = []
+        response = client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            data = response.json()
+            results.extend(data['results'])
+            if data['next'] is None:
+                return results
+            response = client.get(data['next'])
+
+    def test_post_list(self):
+        """Лента отдаётся страницами по курсору с нужными полями."""
+        url = reverse('api:post_list')
+        with self.assertNumQueries(1):
+            data = self.guest_client.get(url).json()
+        self.assertEqual(len(data['results']), PAGE_SIZE)
+        self.assertEqual(
+            set(data['results'][0]),
+            {'id', 'text', 'pub_date', 'author', 'group', 'image',
+             'image_width', 'image_height', 'comment_count'}
+        )
+        results = self.collect(self.guest_client, url, fields='id,author')
+        self.assertEqual(len(results), Post.objects.count())
+        self.assertEqual(set(results[0]), {'id', 'author'})
+
+    def test_filtered_lists(self):
+        """Ленты группы, автора и подписок."""
+        lists = (
+            (self.guest_client, reverse(
+                'api:group_posts', kwargs={'slug': self.group.slug}
+            ), PAGE_SIZE + 5),
+            (self.guest_client, reverse(
+                'api:profile_posts', kwargs={'username': self.user.username}
+            ), 1),
+            (self.authorized_client, reverse('api:follow_posts'),
+             PAGE_SIZE + 5),
+        )
+        for client, url, count in lists:
+            with self.subTest(url=url):
+                self.assertEqual(len(self.collect(client, url)), count)
+
+    def test_cursor_past_end(self):
+        """Курсор за последней записью отдаёт пустую страницу."""
+        lists = (
+            (reverse('api:post_list'), datetime(2000, 1, 1)),
+            (reverse(
+                'api:comment_list', kwargs={'post_id': self.post.pk}
+            ), datetime(2100, 1, 1)),
+        )
+        for url, pub_date in lists:
+            with self.subTest(url=url):
+                cursor = encode_cursor(CURSOR_NEXT, {
+                    'pub_date': pub_date.replace(tzinfo=timezone.utc),
+                    'id': 1,
+                })
+                response = self.guest_client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                data = response.json()
+                self.assertEqual(data['results'], [])
+                self.assertIsNone(data['next'])
+                previous = self.guest_client.get(data['previous']).json()
+                self.assertTrue(previous['results'])
+
+    def test_errors(self):
+        """Ошибки возвращаются в JSON с нужным статусом."""
+        urls_statuses = (
+            (reverse('api:post_list') + '?fields=password',
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:follow_posts'), HTTPStatus.UNAUTHORIZED),
+            (reverse('api:post_detail', kwargs={'post_id': 0}),
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:comment_list', kwargs={'post_id': 0}),
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:group_posts', kwargs={'slug': 'missing'}),
+             HTTPStatus.NOT_FOUND),
+        )
+        for url, status in urls_statuses:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_post_and_comments(self):
+        """Пост и его комментарии."""
+        data = self.guest_client.get(
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk}),
+            {'fields': 'text,comment_count'},
+        ).json()
+        self.assertEqual(data, {'text': 'Другой пост', 'comment_count': 1})
+        comments = self.collect(self.guest_client, reverse(
+            'api:comment_list', kwargs={'post_id': self.post.pk}
+        ))
+        self.assertEqual(comments[0]['author'], self.author.username)
+
+    def test_export(self):
+        """Выгрузка отдаётся потоком и содержит все посты."""
+        response = self.guest_client.get(
+            reverse('api:post_export'), {'group': self.group.slug}
+        )
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data), PAGE_SIZE + 5)
@@ -0,0 +1,149 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from posts.models import FOLLOW_CURSOR_KEYS, Comment, Group, Post, User
+from posts.utils import CursorPaginator
+
+from .fields import FieldsError, parse_fields, select_values, serialize
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+EXPORT_CHUNK_SIZE = 2000
+
+
+def error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        return PAGE_SIZE
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def paginated_response(request, queryset, descending=True,
+                       keys=('pub_date', 'pk')):
+    """Страница queryset в JSON с курсорами соседних страниц."""
+    model = queryset.model
+    try:
+        fields = parse_fields(model, request.GET.get('fields'))
+    except FieldsError as exc:
+        return error(str(exc), 400)
+    paginator = CursorPaginator(
+        select_values(queryset, fields), page_size(request), descending,
+        keys=keys,
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+        'results': [serialize(model, row, fields) for row in page],
+    })
+
+
+@require_safe
+def post_list(request):
+    """Лента всех постов."""
+    return paginated_response(request, Post.objects.feed())
+
+
+@require_safe
+def group_posts(request, slug):
+    """Лента постов группы."""
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return error('Группа не найдена.', 404)
+    return paginated_response(
+        request, Post.objects.feed().filter(group_id=group_id)
+    )
+
+
+@require_safe
+def profile_posts(request, username):
+    """Лента постов автора."""
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return error('Автор не найден.', 404)
+    return paginated_response(
+        request, Post.objects.feed().filter(author_id=author_id)
+    )
+
+
+@require_safe
+def follow_posts(request):
+    """Лента авторов, на которых подписан пользователь."""
+    if not request.user.is_authenticated:
+        return error('Требуется авторизация.', 401)
+    return paginated_response(
+        request, Post.objects.feed().followed_by(request.user),
+        keys=FOLLOW_CURSOR_KEYS,
+    )
+
+
+@require_safe
+def post_detail(request, post_id):
+    """Один пост."""
+    try:
+        fields = parse_fields(Post, request.GET.get('fields'))
+    except FieldsError as exc:
+        return error(str(exc), 400)
+    row = select_values(Post.objects.filter(pk=post_id), fields).first()
+    if row is None:
+        return error('Пост не найден.', 404)
+    return JsonResponse(serialize(Post, row, fields))
+
+
+@require_safe
+def comment_list(request, post_id):
+    """Комментарии поста от старых к новым."""
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Пост не найден.', 404)
+    return paginated_response(
+        request, Comment.objects.filter(post_id=post_id), descending=False
+    )
+
+
+def export_rows(queryset, fields):
+    """JSON-массив постов по частям, без загрузки всей выборки в память."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    yield '['
+    separator = ''
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield separator + encoder.encode(serialize(Post, row, fields))
+        separator = ','
+    yield ']'
+
+
+@require_safe
+def post_export(request):
+    """Выгрузка всех постов потоком; фильтры ?group= и ?author=."""
+    try:
+        fields = parse_fields(Post, request.GET.get('fields'))
+    except FieldsError as exc:
+        return error(str(exc), 400)
+    posts = Post.objects.order_by('pk')
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    response = StreamingHttpResponse(
+        export_rows(select_values(posts, fields), fields),
+        content_type='application/json; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="posts.json"'
+    return response
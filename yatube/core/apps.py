@@ -5,3 +5,6 @@ class CoreConfig(AppConfig):
     """Конфиг приложения core."""
 
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
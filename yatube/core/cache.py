@@ -0,0 +1,554 @@
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+from .caching import LOCK_KEY
+
+# Ограничение SQLite на число параметров в одном запросе.
+MAX_PARAMS = 900
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+)
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+STAMP_KEY = 'tiered:stamp:{}'
+# Меняется только при очистке общего кэша.
+EPOCH_KEY = 'tiered:epoch'
+NAMESPACE_SEPARATOR = re.compile(r'[:|]')
+MISSING = object()
+
+
+def chunks(items, size=MAX_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов на хосте.
+
+    LOCATION — путь к файлу базы. База работает в режиме WAL, поэтому
+    чтение не ждёт записи; incr выполняется в транзакции
+    BEGIN IMMEDIATE и атомарен между процессами.
+
+    Вытеснение — приблизительный LRU: время доступа обновляется
+    не чаще раза в OPTIONS['TOUCH_INTERVAL'] секунд, а при переполнении
+    MAX_ENTRIES удаляется 1/CULL_FREQUENCY давно не читанных ключей.
+    Переполнение проверяется раз в OPTIONS['CULL_EVERY'] записей.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.touch_interval = options.get('TOUCH_INTERVAL', 60)
+        self.cull_every = options.get('CULL_EVERY', 100)
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def connection(self):
+        """Подключение текущего потока; после fork открывается заново."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            for pragma in PRAGMAS:
+                connection.execute(pragma)
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def encode(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def decode(self, value):
+        return pickle.loads(value)
+
+    def key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def touch_accessed(self, keys_accessed, now):
+        """Обновляет время доступа ключей, читанных давно."""
+        stale = [
+            key for key, accessed in keys_accessed
+            if now - accessed > self.touch_interval
+        ]
+        for part in chunks(stale):
+            self.connection.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN '
+                f'({", ".join("?" * len(part))})',
+                [now, *part],
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.key(key, version)
+        now = time.time()
+        row = self.connection.execute(
+            f'SELECT value, accessed FROM cache WHERE key = ? AND {ALIVE}',
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return default
+        self.touch_accessed([(key, row[1])], now)
+        return self.decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.key(key, version): key for key in keys}
+        now = time.time()
+        found = {}
+        accessed = []
+        for part in chunks(list(keys)):
+            rows = self.connection.execute(
+                f'SELECT key, value, accessed FROM cache WHERE key IN '
+                f'({", ".join("?" * len(part))}) AND {ALIVE}',
+                [*part, now],
+            )
+            for key, value, last_access in rows:
+                found[keys[key]] = self.decode(value)
+                accessed.append((key, last_access))
+        self.touch_accessed(accessed, now)
+        return found
+
+    def has_key(self, key, version=None):
+        key = self.key(key, version)
+        return self.connection.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def _write(self, rows):
+        """Записывает строки (key, value, expires) одной транзакцией."""
+        now = time.time()
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                [(key, value, expires, now) for key, value, expires in rows],
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._after_write(len(rows))
+
+    def _after_write(self, count):
+        self._writes += count
+        if self._writes >= self.cull_every:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        connection = self.connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count // self._cull_frequency,),
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        self._write([
+            (key, self.encode(value), self.get_backend_timeout(timeout))
+        ])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self._write([
+            (self.key(key, version), self.encode(value), expires)
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        now = time.time()
+        cursor = self.connection.execute(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (
+                key, self.encode(value),
+                self.get_backend_timeout(timeout), now, now,
+            ),
+        )
+        added = cursor.rowcount > 0
+        if added:
+            self._after_write(1)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.key(key, version)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self.decode(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self.encode(value), key),
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        cursor = self.connection.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.key(key, version)
+        self.connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.key(key, version) for key in keys]
+        for part in chunks(keys):
+            self.connection.execute(
+                f'DELETE FROM cache WHERE key IN '
+                f'({", ".join("?" * len(part))})',
+                part,
+            )
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Подключение живёт всё время процесса: Django вызывает close()
+        # после каждого запроса, а открытие базы дороже самого запроса.
+        pass
+
+
+class LocalTier:
+    """Локальный уровень TieredCache, общий для всех потоков процесса.
+
+    Django создаёт бэкенд кэша в каждом потоке заново, поэтому
+    записи и штампы хранятся здесь, а не в экземпляре бэкенда.
+    """
+
+    def __init__(self):
+        # local_key -> (значение, срок, пространство ключей)
+        self.entries = OrderedDict()
+        self.page_keys = OrderedDict()
+        self.lock = threading.Lock()
+        # Пространство ключей -> последний известный штамп.
+        self.stamps = {}
+        self.epoch = None
+        # Ключи, прочитанные текущим запросом потока.
+        self.request = threading.local()
+
+    def drop(self, namespace):
+        """Удаляет локальные записи пространства ключей."""
+        for local_key in [
+            local_key for local_key, entry in self.entries.items()
+            if entry[2] == namespace
+        ]:
+            del self.entries[local_key]
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def key_namespace(key):
+    """Пространство ключа: часть до первого «:» или «|»."""
+    return NAMESPACE_SEPARATOR.split(key, 1)[0]
+
+
+class TieredCache(BaseCache):
+    """Локальный LRU процесса перед общим кэшем.
+
+    LOCATION — алиас общего кэша в CACHES. Прочитанные значения
+    хранятся в памяти процесса не дольше OPTIONS['LOCAL_TIMEOUT']
+    секунд, не больше OPTIONS['LOCAL_MAX_ENTRIES'] ключей.
+
+    Согласованность держится на штампах пространств ключей (часть
+    ключа до «:») в общем кэше: перезапись, удаление и incr
+    увеличивают штамп своего пространства. В начале запроса штампы
+    читаются одним get_many вместе с ключами, которые эта же страница
+    читала в прошлый раз, и локально сбрасываются только пространства
+    со сменившимся штампом. Запись, сделанная другим процессом, видна
+    со следующего запроса.
+
+    Ключи с префиксами OPTIONS['VERSIONED_PREFIXES'] содержат версию
+    данных, и их значение под тем же ключом не меняется: запись таких
+    ключей штамп не трогает. add штамп тоже не трогает — нового ключа
+    нет в памяти других процессов.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = location
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self.prefetch_paths = options.get('PREFETCH_PATHS', 500)
+        self.prefetch_keys = options.get('PREFETCH_KEYS', 200)
+        # Блокировки пересчёта живут секунды и читаются только
+        # через add: держать их в памяти процесса незачем.
+        self.bypass_prefixes = tuple(options.get(
+            'BYPASS_PREFIXES', (LOCK_KEY.format(''),)
+        ))
+        self.versioned_prefixes = tuple(options.get(
+            'VERSIONED_PREFIXES', ('fragment:', 'feed_query:')
+        ))
+        with _tiers_lock:
+            self.tier = _tiers.setdefault(location, LocalTier())
+
+    @cached_property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def local_key(self, key, version=None):
+        return self.make_key(key, version=version)
+
+    def bypass(self, key):
+        return key.startswith(self.bypass_prefixes)
+
+    def versioned(self, key):
+        return key.startswith(self.versioned_prefixes)
+
+    def _get_local(self, local_key, now):
+        entry = self.tier.entries.get(local_key)
+        if entry is None:
+            return MISSING
+        value, expires, _ = entry
+        if expires <= now:
+            del self.tier.entries[local_key]
+            return MISSING
+        self.tier.entries.move_to_end(local_key)
+        return value
+
+    def _set_local(self, key, version, value, timeout=DEFAULT_TIMEOUT):
+        local_timeout = self.local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            local_timeout = min(local_timeout, timeout)
+        namespace = key_namespace(key)
+        # Штамп нового пространства ещё не читался: записи сбросятся
+        # при первой сверке в begin_request.
+        self.tier.stamps.setdefault(namespace, MISSING)
+        entries = self.tier.entries
+        local_key = self.local_key(key, version)
+        entries[local_key] = (
+            value, time.monotonic() + local_timeout, namespace
+        )
+        entries.move_to_end(local_key)
+        while len(entries) > self.local_max_entries:
+            entries.popitem(last=False)
+
+    def _remember(self, keys, version):
+        # Ключи страницы запоминаются для предзагрузки в следующий раз.
+        page_keys = getattr(self.tier.request, 'keys', None)
+        if page_keys is not None and version is None:
+            page_keys.update(keys)
+
+    def _bump(self, keys):
+        """Увеличивает штампы пространств изменённых ключей."""
+        namespaces = {
+            key_namespace(key) for key in keys
+            if not self.bypass(key) and not self.versioned(key)
+        }
+        for namespace in namespaces:
+            self._bump_namespace(namespace)
+
+    def _bump_namespace(self, namespace):
+        stamp_key = STAMP_KEY.format(namespace)
+        try:
+            stamp = self.shared.incr(stamp_key)
+        except ValueError:
+            stamp = int(time.time() * 1000)
+            self.shared.set(stamp_key, stamp, None)
+        with self.tier.lock:
+            known = self.tier.stamps.get(namespace, MISSING)
+            # Штамп изменил не только этот процесс: записи пространства
+            # могли устареть.
+            if known is MISSING or known is None or stamp != known + 1:
+                self.tier.drop(namespace)
+            self.tier.stamps[namespace] = stamp
+
+    def begin_request(self, path):
+        """Сверяет штампы и предзагружает ключи страницы path."""
+        now = time.monotonic()
+        with self.tier.lock:
+            namespaces = list(self.tier.stamps)
+            keys = [
+                key for key in self.tier.page_keys.get(path, ())
+                if self._get_local(self.local_key(key), now) is MISSING
+            ]
+        stamp_keys = [STAMP_KEY.format(namespace) for namespace in namespaces]
+        values = self.shared.get_many([EPOCH_KEY, *stamp_keys, *keys])
+        epoch = values.pop(EPOCH_KEY, None)
+        with self.tier.lock:
+            if epoch != self.tier.epoch:
+                # Общий кэш очищен: штампы пропали вместе с ключами.
+                self.tier.entries.clear()
+                self.tier.epoch = epoch
+            for namespace, stamp_key in zip(namespaces, stamp_keys):
+                stamp = values.pop(stamp_key, None)
+                if self.tier.stamps.get(namespace, MISSING) != stamp:
+                    self.tier.drop(namespace)
+                    self.tier.stamps[namespace] = stamp
+            for key, value in values.items():
+                self._set_local(key, None, value)
+        self.tier.request.path = path
+        self.tier.request.keys = set()
+
+    def end_request(self):
+        path = getattr(self.tier.request, 'path', None)
+        keys = getattr(self.tier.request, 'keys', None)
+        self.tier.request.path = self.tier.request.keys = None
+        if path is None or not keys:
+            return
+        with self.tier.lock:
+            self.tier.page_keys[path] = tuple(keys)[:self.prefetch_keys]
+            self.tier.page_keys.move_to_end(path)
+            while len(self.tier.page_keys) > self.prefetch_paths:
+                self.tier.page_keys.popitem(last=False)
+
+    def get(self, key, default=None, version=None):
+        if self.bypass(key):
+            return self.shared.get(key, default, version=version)
+        local_key = self.local_key(key, version)
+        self._remember((key,), version)
+        with self.tier.lock:
+            value = self._get_local(local_key, time.monotonic())
+        if value is not MISSING:
+            return value
+        value = self.shared.get(key, MISSING, version=version)
+        if value is MISSING:
+            return default
+        with self.tier.lock:
+            self._set_local(key, version, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        self._remember(keys, version)
+        found = {}
+        now = time.monotonic()
+        with self.tier.lock:
+            for key in keys:
+                value = self._get_local(self.local_key(key, version), now)
+                if value is not MISSING:
+                    found[key] = value
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self.shared.get_many(missing, version=version)
+            with self.tier.lock:
+                for key, value in fetched.items():
+                    self._set_local(key, version, value)
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        if self.bypass(key):
+            return
+        self._bump((key,))
+        with self.tier.lock:
+            self._set_local(key, version, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        self._bump(data)
+        with self.tier.lock:
+            for key, value in data.items():
+                if key not in failed and not self.bypass(key):
+                    self._set_local(key, version, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Новый ключ не может лежать в локальном уровне других
+        # процессов, поэтому штамп не меняется.
+        added = self.shared.add(key, value, timeout, version=version)
+        if added and not self.bypass(key):
+            with self.tier.lock:
+                self._set_local(key, version, value, timeout)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._bump((key,))
+        with self.tier.lock:
+            self._set_local(key, version, value)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        if self.bypass(key):
+            return
+        self._bump((key,))
+        with self.tier.lock:
+            self.tier.entries.pop(self.local_key(key, version), None)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        self._bump(keys)
+        with self.tier.lock:
+            for key in keys:
+                self.tier.entries.pop(self.local_key(key, version), None)
+
+    def clear(self):
+        self.shared.clear()
+        epoch = int(time.time() * 1000)
+        self.shared.set(EPOCH_KEY, epoch, None)
+        with self.tier.lock:
+            self.tier.entries.clear()
+            self.tier.stamps.clear()
+            self.tier.epoch = epoch
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,91 @@
+import math
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .middleware import current_metrics
+
+LOCK_KEY = 'compute_lock:{}'
+WAIT_INTERVAL = 0.05
+
+# Счётчики процесса: hit, stale, early, refresh, miss, wait, wait_timeout.
+stats = Counter()
+
+
+def _count(event):
+    stats[event] += 1
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.cache[event] += 1
+
+
+def _option(name, default):
+    return getattr(settings, 'CACHE_COMPUTE', {}).get(name, default)
+
+
+def _store(backend, key, compute, timeout, stale_timeout):
+    started = time.perf_counter()
+    value = compute()
+    delta = time.perf_counter() - started
+    if timeout is None:
+        expires, hard_timeout = None, None
+    else:
+        expires = time.time() + timeout
+        hard_timeout = timeout + stale_timeout
+    backend.set(key, (value, delta, expires), hard_timeout)
+    return value
+
+
+def get_or_compute(key, compute, timeout, *, stale_timeout=None,
+                   beta=None, cache_alias='default'):
+    """Значение из кэша или compute() без лавины пересчётов.
+
+    Пересчитывает только тот, кто взял короткую блокировку в кэше.
+    Остальные получают устаревшее значение, пока оно хранится
+    stale_timeout секунд после истечения timeout, а если значения
+    нет совсем — ждут результат до WAIT_TIMEOUT. Незадолго до
+    истечения значение обновляется заранее с вероятностью, растущей
+    с временем вычисления (XFetch, коэффициент beta).
+    """
+    backend = caches[cache_alias]
+    if stale_timeout is None:
+        stale_timeout = _option('STALE_TIMEOUT', 60)
+    if beta is None:
+        beta = _option('BETA', 1.0)
+    lock_key = LOCK_KEY.format(key)
+    lock_timeout = _option('LOCK_TIMEOUT', 10)
+
+    entry = backend.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        now = time.time()
+        # 1 - random() лежит в (0, 1], логарифм не бывает бесконечным.
+        early = delta * beta * math.log(1 - random.random())
+        if expires is None or now - early < expires:
+            _count('hit')
+            return value
+        if not backend.add(lock_key, 1, lock_timeout):
+            _count('stale')
+            return value
+        _count('early' if now < expires else 'refresh')
+    elif not backend.add(lock_key, 1, lock_timeout):
+        deadline = time.monotonic() + _option('WAIT_TIMEOUT', 3)
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            entry = backend.get(key)
+            if entry is not None:
+                _count('wait')
+                return entry[0]
+        # Вычисляющий не успел: считаем сами, но блокировку не трогаем.
+        _count('wait_timeout')
+        return _store(backend, key, compute, timeout, stale_timeout)
+    else:
+        _count('miss')
+
+    try:
+        return _store(backend, key, compute, timeout, stale_timeout)
+    finally:
+        backend.delete(lock_key)
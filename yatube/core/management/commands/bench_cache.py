@@ -0,0 +1,92 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = (
+    ('locmem', 'django.core.cache.backends.locmem.LocMemCache'),
+    ('file', 'django.core.cache.backends.filebased.FileBasedCache'),
+    ('sqlite', 'core.cache.SQLiteCache'),
+)
+
+
+class Command(BaseCommand):
+    """Сравнивает скорость бэкендов кэша."""
+
+    help = (
+        'Измеряет set, get, get_many и incr для LocMemCache, '
+        'FileBasedCache и core.cache.SQLiteCache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument(
+            '--value-size', type=int, default=2048,
+            help='Размер значения в байтах (фрагмент HTML).',
+        )
+        parser.add_argument(
+            '--batch', type=int, default=10,
+            help='Ключей в одном get_many.',
+        )
+
+    def make_cache(self, backend, directory):
+        location = os.path.join(directory, 'cache.sqlite3')
+        if backend.endswith('FileBasedCache'):
+            location = os.path.join(directory, 'files')
+        return import_string(backend)(location, {
+            'OPTIONS': {'MAX_ENTRIES': 10 ** 6},
+        })
+
+    def timed(self, operation, count):
+        started = time.perf_counter()
+        operation()
+        return count / (time.perf_counter() - started)
+
+    def measure(self, cache, options):
+        keys = [f'bench:{i}' for i in range(options['keys'])]
+        value = 'x' * options['value_size']
+        batch = options['batch']
+        batches = [
+            keys[start:start + batch]
+            for start in range(0, len(keys), batch)
+        ]
+
+        def set_all():
+            for key in keys:
+                cache.set(key, value)
+
+        def get_all():
+            for key in keys:
+                cache.get(key)
+
+        def get_batches():
+            for part in batches:
+                cache.get_many(part)
+
+        def incr_all():
+            for _ in keys:
+                cache.incr('bench:counter')
+
+        cache.set('bench:counter', 0)
+        return (
+            self.timed(set_all, len(keys)),
+            self.timed(get_all, len(keys)),
+            self.timed(get_batches, len(keys)),
+            self.timed(incr_all, len(keys)),
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"бэкенд":<10}{"set/с":>12}{"get/с":>12}'
+            f'{"get_many/с":>12}{"incr/с":>12}'
+        )
+        for name, backend in BACKENDS:
+            with tempfile.TemporaryDirectory() as directory:
+                cache = self.make_cache(backend, directory)
+                rates = self.measure(cache, options)
+                cache.close()
+            self.stdout.write(
+                f'{name:<10}' + ''.join(f'{rate:>12.0f}' for rate in rates)
+            )
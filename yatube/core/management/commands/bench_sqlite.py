@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    'id INTEGER PRIMARY KEY, text TEXT NOT NULL, '
+    'author_id INTEGER NOT NULL, pub_date REAL NOT NULL)',
+    'CREATE INDEX post_date_idx ON post (pub_date DESC, id DESC)',
+)
+READ_SQL = (
+    'SELECT id, text, author_id FROM post ORDER BY pub_date DESC LIMIT 10'
+)
+WRITE_SQL = 'INSERT INTO post (text, author_id, pub_date) VALUES (?, ?, ?)'
+
+
+class Command(BaseCommand):
+    """Сравнивает параллельные чтение и запись в SQLite с PRAGMA и без."""
+
+    help = (
+        'Запускает читателей и писателей на временной базе SQLite '
+        'с настройками по умолчанию и с SQLITE_PRODUCTION_PRAGMAS '
+        'и выводит число операций в секунду и ошибок блокировки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Длительность прогона каждого профиля, секунд.',
+        )
+        parser.add_argument(
+            '--rows', type=int, default=10000,
+            help='Строк в таблице перед прогоном.',
+        )
+
+    def connect(self, path, pragmas):
+        # Тот же таймаут, что у бэкенда Django по умолчанию.
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def prepare(self, path, rows):
+        connection = sqlite3.connect(path)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        now = time.time()
+        connection.executemany(WRITE_SQL, (
+            (f'Пост {i}', i % 100, now - i) for i in range(rows)
+        ))
+        connection.commit()
+        connection.close()
+
+    def worker(self, path, pragmas, sql, write, deadline, results):
+        connection = self.connect(path, pragmas)
+        done = errors = 0
+        while time.monotonic() < deadline:
+            try:
+                if write:
+                    connection.execute(sql, ('Новый пост', 1, time.time()))
+                else:
+                    connection.execute(sql).fetchall()
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        connection.close()
+        results.append((write, done, errors))
+
+    def run(self, pragmas, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            self.prepare(path, options['rows'])
+            # journal_mode хранится в файле базы: включаем заранее.
+            self.connect(path, pragmas).close()
+            results = []
+            deadline = time.monotonic() + options['duration']
+            threads = [
+                threading.Thread(target=self.worker, args=(
+                    path, pragmas, sql, write, deadline, results
+                ))
+                for write, sql, count in (
+                    (False, READ_SQL, options['readers']),
+                    (True, WRITE_SQL, options['writers']),
+                )
+                for _ in range(count)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return {
+            write: (
+                sum(done for kind, done, _ in results if kind == write)
+                / options['duration'],
+                sum(errors for kind, _, errors in results if kind == write),
+            )
+            for write in (False, True)
+        }
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('по умолчанию', {}),
+            ('production', settings.SQLITE_PRODUCTION_PRAGMAS),
+        )
+        self.stdout.write(
+            f'{"профиль":<14}{"чтений/с":>12}{"записей/с":>12}'
+            f'{"блокировок":>12}'
+        )
+        for name, pragmas in profiles:
+            stats = self.run(pragmas, options)
+            reads, read_errors = stats[False]
+            writes, write_errors = stats[True]
+            self.stdout.write(
+                f'{name:<14}{reads:>12.0f}{writes:>12.0f}'
+                f'{read_errors + write_errors:>12}'
+            )
@@ -0,0 +1,134 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_original_render = Template.render
+
+
+class RequestMetrics:
+    """Метрики одного запроса."""
+
+    __slots__ = ('queries', 'db_time', 'template_time', 'rendering', 'cache')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+        # События core.caching.get_or_compute: hit, miss, wait и др.
+        self.cache = Counter()
+
+
+def current_metrics():
+    """Метрики текущего запроса или None, если запрос не измеряется."""
+    return getattr(_local, 'metrics', None)
+
+
+def _timed_render(self, context=None, request=None):
+    metrics = current_metrics()
+    if metrics is None or metrics.rendering:
+        return _original_render(self, context, request)
+    metrics.rendering = True
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        metrics.template_time += time.perf_counter() - started
+        metrics.rendering = False
+
+
+def _timed_execute(execute, sql, params, many, context):
+    metrics = current_metrics()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    """Измеряет SQL-запросы, время БД, шаблонов и всего запроса.
+
+    Результат отдаётся заголовком Server-Timing и JSON-строкой
+    в лог. Измеряется доля запросов REQUEST_METRICS['SAMPLE_RATE'];
+    медленные запросы пишутся в лог всегда. Выключенный middleware
+    исключается из цепочки при старте и ничего не стоит.
+    """
+
+    def __init__(self, get_response):
+        options = settings.REQUEST_METRICS
+        if not options.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = options.get('SAMPLE_RATE', 1.0)
+        self.slow_request = options.get('SLOW_REQUEST_MS', 500) / 1000
+        # Замер шаблонов: оборачивается рендер верхнего уровня,
+        # include внутри шаблона отдельно не считаются.
+        Template.render = _timed_render
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if random.random() >= self.sample_rate:
+            response = self.get_response(request)
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.slow_request:
+                self.log(request, response, elapsed)
+            return response
+
+        metrics = _local.metrics = RequestMetrics()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_timed_execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        elapsed = time.perf_counter() - started
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'tpl;dur={metrics.template_time * 1000:.1f}',
+            f'total;dur={elapsed * 1000:.1f}',
+        ))
+        self.log(request, response, elapsed, metrics)
+        return response
+
+    def log(self, request, response, elapsed, metrics=None):
+        resolver_match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': resolver_match.view_name if resolver_match else None,
+            'status': response.status_code,
+            'total_ms': round(elapsed * 1000, 1),
+        }
+        if metrics is not None:
+            record.update({
+                'queries': metrics.queries,
+                'db_ms': round(metrics.db_time * 1000, 1),
+                'template_ms': round(metrics.template_time * 1000, 1),
+            })
+            if metrics.cache:
+                record['cache'] = dict(metrics.cache)
+        slow = elapsed >= self.slow_request
+        record['slow'] = slow
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            json.dumps(record, ensure_ascii=False),
+        )
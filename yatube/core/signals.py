@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .cache import TieredCache
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Выполняет SQLITE_PRAGMAS на новом подключении SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def tiered_caches():
+    return [
+        backend for backend in caches.all()
+        if isinstance(backend, TieredCache)
+    ]
+
+
+@receiver(request_started)
+def begin_cache_request(sender, environ=None, **kwargs):
+    """Сверяет штамп TieredCache и предзагружает ключи страницы."""
+    if environ is None:
+        return
+    path = environ.get('PATH_INFO', '')
+    if environ.get('QUERY_STRING'):
+        path = f'{path}?{environ["QUERY_STRING"]}'
+    for backend in tiered_caches():
+        backend.begin_request(path)
+
+
+@receiver(request_finished)
+def end_cache_request(sender, **kwargs):
+    """Запоминает ключи, которые читала страница."""
+    for backend in tiered_caches():
+        backend.end_request()
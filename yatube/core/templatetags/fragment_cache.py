@@ -0,0 +1,55 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from ..caching import get_or_compute
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        if timeout is not None:
+            try:
+                timeout = int(timeout)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"fragment_cache" tag got a non-integer timeout '
+                    f'value: {timeout!r}'
+                )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = 'fragment:' + make_template_fragment_key(
+            self.fragment_name, vary_on
+        )
+        return get_or_compute(
+            key, lambda: self.nodelist.render(context), timeout
+        )
+
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    """Кэширует фрагмент как {% cache %}, но без лавины пересчётов.
+
+    {% fragment_cache timeout name [vary_on ...] %}...
+    {% endfragment_cache %}; пересчёт идёт через
+    core.caching.get_or_compute.
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'"{tokens[0]}" tag requires at least 2 arguments.'
+        )
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
@@ -0,0 +1,229 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from ..cache import LocalTier, SQLiteCache, TieredCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    """Класс для тестирования кэша в файле SQLite."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_get_set(self):
+        """Значения сохраняются и читаются с учётом таймаута."""
+        self.cache.set('key', {'a': 1})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.cache.set('expired', 1, timeout=0)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+        self.cache.delete('key')
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_many(self):
+        """get_many и set_many работают с пачками ключей."""
+        self.cache = self.make_cache(MAX_ENTRIES=2000)
+        data = {f'key-{i}': i for i in range(1000)}
+        self.assertEqual(self.cache.set_many(data), [])
+        self.assertEqual(self.cache.get_many([*data, 'missing']), data)
+        self.cache.delete_many(list(data)[:500])
+        self.assertEqual(len(self.cache.get_many(data)), 500)
+
+    def test_add_and_incr(self):
+        """add не перезаписывает живой ключ, incr меняет значение."""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.decr('counter'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('old', 1, timeout=0)
+        self.assertTrue(self.cache.add('old', 2))
+
+    def test_shared_between_instances(self):
+        """Экземпляры с одним файлом видят записи друг друга."""
+        other = self.make_cache()
+        self.cache.set('shared', 'value')
+        self.assertEqual(other.get('shared'), 'value')
+        other.incr('shared_counter', 1) if other.add('shared_counter', 0) \
+            else None
+        self.assertEqual(self.cache.get('shared_counter'), 1)
+        other.clear()
+        self.assertIsNone(self.cache.get('shared'))
+
+    def test_lru_cull(self):
+        """При переполнении вытесняются давно не читанные ключи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_EVERY=1, TOUCH_INTERVAL=0
+        )
+        for i in range(10):
+            cache.set(f'key-{i}', i)
+        time.sleep(0.01)
+        cache.get('key-0')
+        cache.set('key-10', 10)
+        self.assertEqual(cache.get('key-0'), 0)
+        self.assertIsNone(cache.get('key-1'))
+        self.assertEqual(cache.get('key-10'), 10)
+
+    def test_bench_cache(self):
+        """Бенчмарк выводит строку для каждого бэкенда."""
+        out = StringIO()
+        call_command('bench_cache', keys=20, stdout=out)
+        self.assertIn('sqlite', out.getvalue())
+
+
+class TieredCacheTest(SimpleTestCase):
+    """Класс для тестирования LRU процесса перед общим кэшем.
+
+    Два экземпляра TieredCache с одним файлом SQLite изображают
+    два процесса.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.first = self.make_cache()
+        self.second = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        cache = TieredCache('shared', {'OPTIONS': options})
+        cache.shared = SQLiteCache(self.location, {})
+        cache.tier = LocalTier()
+        return cache
+
+    def test_local_hit(self):
+        """Повторное чтение не ходит в общий кэш."""
+        self.first.set('key', 'value')
+        with mock.patch.object(
+            self.first.shared, 'get', side_effect=AssertionError
+        ):
+            self.assertEqual(self.first.get('key'), 'value')
+        self.assertEqual(self.first.get_many(['key', 'missing']), {
+            'key': 'value',
+        })
+
+    def test_stamp_invalidates_other_process(self):
+        """Запись другого процесса видна со следующего запроса."""
+        self.first.set('key', 'old')
+        self.second.begin_request('/')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.second.begin_request('/')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.second.begin_request('/')
+        self.assertIsNone(self.second.get('key'))
+
+    def local_only(self, cache):
+        return mock.patch.object(
+            cache.shared, 'get', side_effect=AssertionError
+        )
+
+    def test_write_drops_only_its_namespace(self):
+        """Запись другого процесса сбрасывает только своё пространство."""
+        self.first.set('feed_version:a', 1)
+        self.first.set('posts:count', 10)
+        for _ in range(2):
+            # Первая сверка узнаёт штампы новых пространств.
+            self.second.begin_request('/')
+            self.second.get('feed_version:a')
+            self.second.get('posts:count')
+        self.first.incr('feed_version:a')
+        self.second.begin_request('/')
+        with self.local_only(self.second):
+            self.assertEqual(self.second.get('posts:count'), 10)
+        self.assertEqual(self.second.get('feed_version:a'), 2)
+
+    def test_versioned_write_keeps_local_entries(self):
+        """Запись ключей с версией не сбрасывает память процессов."""
+        self.first.set('posts:count', 10)
+        for _ in range(2):
+            self.second.begin_request('/')
+            self.second.get('posts:count')
+        with mock.patch.object(
+            self.first.shared, 'incr', side_effect=AssertionError
+        ):
+            self.first.set('fragment:page', 'html')
+            self.first.set_many({'feed_query:ids': [1, 2]})
+        self.second.begin_request('/')
+        with self.local_only(self.second):
+            self.assertEqual(self.second.get('posts:count'), 10)
+
+    def test_clear_resets_other_process(self):
+        """Очистка общего кэша видна другому процессу."""
+        self.first.set('key', 'value')
+        self.second.begin_request('/')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.first.clear()
+        self.second.begin_request('/')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_own_write_keeps_local_entries(self):
+        """Своя запись не сбрасывает остальной локальный уровень."""
+        self.first.set('a', 1)
+        self.first.set('b', 2)
+        with mock.patch.object(
+            self.first.shared, 'get', side_effect=AssertionError
+        ):
+            self.assertEqual(self.first.get('a'), 1)
+
+    def test_prefetch_page_keys(self):
+        """Ключи страницы предзагружаются одним get_many."""
+        self.first.set_many({'a': 1, 'b': 2})
+        self.second.begin_request('/page/')
+        self.second.get('a')
+        self.second.get_many(['b'])
+        self.second.end_request()
+        self.second.tier.entries.clear()
+        with mock.patch.object(
+            self.second.shared, 'get_many',
+            wraps=self.second.shared.get_many,
+        ) as get_many:
+            self.second.begin_request('/page/')
+        get_many.assert_called_once()
+        self.assertCountEqual(get_many.call_args[0][0], [
+            'tiered:epoch', 'tiered:stamp:a', 'tiered:stamp:b', 'a', 'b',
+        ])
+        with mock.patch.object(
+            self.second.shared, 'get', side_effect=AssertionError
+        ):
+            self.assertEqual(self.second.get('a'), 1)
+
+    def test_local_limits(self):
+        """Локальный уровень ограничен по числу ключей и времени."""
+        cache = self.make_cache(LOCAL_MAX_ENTRIES=2, LOCAL_TIMEOUT=0.05)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.assertEqual(list(cache.tier.entries), [
+            cache.local_key('b'), cache.local_key('c'),
+        ])
+        time.sleep(0.06)
+        self.first.shared.set('c', 'changed')
+        self.assertEqual(cache.get('c'), 'changed')
+
+    def test_compute_locks_bypass_local(self):
+        """Блокировки пересчёта не попадают в память процесса."""
+        self.assertTrue(self.first.add('compute_lock:key', 1))
+        self.assertFalse(self.second.add('compute_lock:key', 1))
+        self.assertEqual(self.first.tier.entries, {})
+        self.first.delete('compute_lock:key')
+        self.assertTrue(self.second.add('compute_lock:key', 1))
@@ -0,0 +1,104 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from ..caching import LOCK_KEY, get_or_compute, stats
+
+FAST_WAIT = {'LOCK_TIMEOUT': 10, 'WAIT_TIMEOUT': 0.2}
+
+
+class GetOrComputeTest(TestCase):
+    """Класс для тестирования get_or_compute."""
+
+    def setUp(self):
+        cache.clear()
+        stats.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'значение {self.calls}'
+
+    def expire(self, key):
+        value, delta, expires = cache.get(key)
+        cache.set(key, (value, delta, time.time() - 1))
+
+    def test_hit_after_miss(self):
+        """Второе чтение берёт значение из кэша."""
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'значение 1')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'значение 1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(stats['miss'], 1)
+        self.assertEqual(stats['hit'], 1)
+        self.assertIsNone(cache.get(LOCK_KEY.format('key')))
+
+    def test_expired_value_recomputed(self):
+        """Истёкшее значение пересчитывает взявший блокировку."""
+        get_or_compute('key', self.compute, 60)
+        self.expire('key')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'значение 2')
+        self.assertEqual(stats['refresh'], 1)
+
+    def test_stale_served_while_locked(self):
+        """Пока другой пересчитывает, отдаётся устаревшее значение."""
+        get_or_compute('key', self.compute, 60)
+        self.expire('key')
+        cache.add(LOCK_KEY.format('key'), 1)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'значение 1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(stats['stale'], 1)
+
+    @override_settings(CACHE_COMPUTE=FAST_WAIT)
+    def test_waits_for_other_computation(self):
+        """Без значения запрос ждёт результат взявшего блокировку."""
+        cache.add(LOCK_KEY.format('key'), 1)
+        timer = threading.Timer(
+            0.05, cache.set, ('key', ('чужое значение', 0.0, None))
+        )
+        timer.start()
+        self.addCleanup(timer.cancel)
+        value = get_or_compute('key', self.compute, 60)
+        self.assertEqual(value, 'чужое значение')
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(stats['wait'], 1)
+
+    @override_settings(CACHE_COMPUTE=FAST_WAIT)
+    def test_wait_timeout_computes(self):
+        """Не дождавшись результата, запрос считает значение сам."""
+        cache.add(LOCK_KEY.format('key'), 1)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'значение 1')
+        self.assertEqual(stats['wait_timeout'], 1)
+
+    def test_early_refresh(self):
+        """Долгое вычисление обновляется до истечения срока."""
+        cache.set('key', ('старое', 3600.0, time.time() + 60))
+        with mock.patch('core.caching.random.random', return_value=0.5):
+            value = get_or_compute('key', self.compute, 60)
+        self.assertEqual(value, 'значение 1')
+        self.assertEqual(stats['early'], 1)
+
+    def test_lock_released_on_error(self):
+        """Ошибка вычисления снимает блокировку."""
+        def fail():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            get_or_compute('key', fail, 60)
+        self.assertIsNone(cache.get(LOCK_KEY.format('key')))
+
+    def test_template_tag(self):
+        """Тег fragment_cache отдаёт фрагмент из кэша."""
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% fragment_cache 60 block name %}{{ name }}'
+            '{% endfragment_cache %}'
+        )
+        self.assertEqual(template.render(Context({'name': 'a'})), 'a')
+        stats.clear()
+        self.assertEqual(template.render(Context({'name': 'a'})), 'a')
+        self.assertEqual(stats['hit'], 1)
+        self.assertEqual(template.render(Context({'name': 'b'})), 'b')
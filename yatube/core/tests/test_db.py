@@ -0,0 +1,34 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ..signals import apply_sqlite_pragmas
+
+
+class SqlitePragmasTest(TestCase):
+    """Проверка настройки подключений SQLite."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -4321})
+    def test_pragmas_applied(self):
+        """PRAGMA из настроек выполняются на подключении."""
+        previous = self.pragma('cache_size')
+        apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(self.pragma('cache_size'), -4321)
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {previous}')
+
+    def test_bench_sqlite(self):
+        """Бенчмарк выводит строку для каждого профиля."""
+        out = StringIO()
+        call_command(
+            'bench_sqlite', readers=1, writers=1, duration=0.2, rows=100,
+            stdout=out,
+        )
+        self.assertIn('production', out.getvalue())
@@ -0,0 +1,48 @@
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+METRICS_ON = {'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 500}
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    """Класс для тестирования middleware метрик запросов."""
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    @override_settings(REQUEST_METRICS=METRICS_ON)
+    def test_server_timing_header(self):
+        """Измеренный запрос отдаёт Server-Timing и пишет лог."""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('miss', record['cache'])
+        self.assertFalse(record['slow'])
+
+    @override_settings(REQUEST_METRICS={**METRICS_ON, 'SLOW_REQUEST_MS': 0})
+    def test_slow_request_logged_as_warning(self):
+        """Медленный запрос пишется в лог с уровнем WARNING."""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.guest_client.get(reverse('posts:index'))
+        self.assertTrue(json.loads(logs.records[0].getMessage())['slow'])
+
+    @override_settings(REQUEST_METRICS={**METRICS_ON, 'SAMPLE_RATE': 0})
+    def test_not_sampled_request(self):
+        """Запрос вне выборки не получает Server-Timing."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_disabled(self):
+        """Выключенный middleware ничего не добавляет."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
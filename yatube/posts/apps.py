@@ -5,3 +5,6 @@ class PostsConfig(AppConfig):
     """Конфиг приложения posts."""
 
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,189 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+from core.caching import get_or_compute
+
+FEED_VERSION_KEY = 'feed_version:{}'
+FEED_MODIFIED_KEY = 'feed_modified:{}'
+QUERY_CACHE_KEY = 'feed_query:{}'
+GLOBAL_SCOPE = 'global'
+
+
+def group_scope(slug):
+    """Область кэша ленты группы."""
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    """Область кэша ленты автора."""
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    """Область страницы поста: сам пост и его комментарии."""
+    return f'post:{post_id}'
+
+
+def post_feed_scopes(author_username, group_slug):
+    """Области кэша лент, в которых виден пост."""
+    scopes = [GLOBAL_SCOPE, author_scope(author_username)]
+    if group_slug:
+        scopes.append(group_scope(group_slug))
+    return scopes
+
+
+def _scope_hash(scope):
+    # В slug и username бывают символы, недопустимые в ключах memcached.
+    return hashlib.md5(scope.encode()).hexdigest()
+
+
+def _version_key(scope):
+    return FEED_VERSION_KEY.format(_scope_hash(scope))
+
+
+def _modified_key(scope):
+    return FEED_MODIFIED_KEY.format(_scope_hash(scope))
+
+
+def _initial_version():
+    # Версия, заведённая после вытеснения ключа из кэша, не должна
+    # совпасть со старой, иначе снова станут видны устаревшие фрагменты.
+    return int(time.time() * 1000)
+
+
+def feed_state(*scopes, create=True):
+    """Версии областей и время их последнего изменения.
+
+    Возвращает пару (строка версий, unix-время). Время изменения,
+    потерянное при вытеснении из кэша, считается равным текущему.
+    С create=False недостающие ключи не заводятся и возвращается None.
+    """
+    version_keys = [_version_key(scope) for scope in scopes]
+    modified_keys = [_modified_key(scope) for scope in scopes]
+    values = cache.get_many(version_keys + modified_keys)
+    if not create and len(values) < len(version_keys + modified_keys):
+        return None
+    timeout = settings.FEED_STATE_TIMEOUT
+    for key in version_keys:
+        if key not in values:
+            cache.add(key, _initial_version(), timeout)
+            values[key] = cache.get(key)
+    for key in modified_keys:
+        if key not in values:
+            cache.add(key, time.time(), timeout)
+            values[key] = cache.get(key)
+    return (
+        '.'.join(str(values[key]) for key in version_keys),
+        max(values[key] for key in modified_keys),
+    )
+
+
+def feed_versions(*scopes):
+    """Возвращает строку с текущими версиями областей кэша лент."""
+    return feed_state(*scopes)[0]
+
+
+def bump_feed_versions(*scopes):
+    """Увеличивает версии областей, делая их кэш недействительным."""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), settings.FEED_STATE_TIMEOUT)
+    now = time.time()
+    cache.set_many(
+        {_modified_key(scope): now for scope in scopes},
+        settings.FEED_STATE_TIMEOUT,
+    )
+
+
+def feed_cache_context(*scopes):
+    """Переменные шаблона для {% cache %} фрагментов ленты."""
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_cache_version': feed_versions(*scopes),
+    }
+
+
+class CachedRows:
+    """Записи страницы по закэшированному списку id.
+
+    Записи загружаются одним in_bulk() при первом обращении, поэтому
+    len() и страница, целиком взятая из кэша фрагментов, обходятся
+    без запросов к базе.
+    """
+
+    def __init__(self, queryset, ids, rows=None):
+        self.queryset = queryset
+        self.ids = ids
+        if rows is not None:
+            self.__dict__['rows'] = rows
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    @cached_property
+    def rows(self):
+        objects = self.queryset.in_bulk(self.ids)
+        return [objects[pk] for pk in self.ids if pk in objects]
+
+
+class CachedQuery:
+    """Кэш-aside для выборки ленты: число записей и id страниц.
+
+    Ключи содержат версии областей scopes, поэтому сигналы
+    сбрасывают кэш одним incr, не перебирая ключи. Срез
+    возвращает CachedRows; поддерживаются только срезы, которыми
+    пользуется Paginator.
+    """
+
+    def __init__(self, queryset, scopes):
+        self.queryset = queryset
+        self.scopes = scopes
+
+    @cached_property
+    def version(self):
+        return feed_versions(*self.scopes)
+
+    def cache_key(self, *parts):
+        sql, params = self.queryset.query.sql_with_params()
+        raw = '|'.join(map(str, (sql, params, self.version, *parts)))
+        return QUERY_CACHE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+    def cached(self, name, compute):
+        """Значение из кэша или результат compute(), сохранённый в кэш."""
+        return get_or_compute(
+            self.cache_key(name), compute, settings.FEED_CACHE_TIMEOUT
+        )
+
+    def forget(self, name):
+        """Удаляет значение из кэша; следующий запрос вычислит его заново."""
+        cache.delete(self.cache_key(name))
+
+    def count(self):
+        return self.cached('count', self.queryset.count)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('CachedQuery поддерживает только срезы.')
+        rows = None
+
+        def page_ids():
+            # Промах: страница читается целиком, в кэш кладутся только id.
+            nonlocal rows
+            rows = list(self.queryset[index])
+            return [row.pk for row in rows]
+
+        ids = self.cached(f'ids:{index.start}:{index.stop}', page_ids)
+        return CachedRows(self.queryset, ids, rows)
@@ -0,0 +1,65 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                quote_etag)
+from django.utils.http import http_date
+
+from .cache import feed_state
+
+
+def page_etag(request, version):
+    """ETag страницы: версии её областей, пользователь, адрес и CSRF.
+
+    Страницы с формами содержат CSRF-токен, который Django меняет
+    при входе: без cookie токена в ETag браузер получил бы 304
+    и отправил форму со старым токеном.
+    """
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    raw = f'{version}|{request.user.pk}|{request.get_full_path()}|{csrf}'
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def conditional_page(scopes_func):
+    """Отвечает 304 на If-None-Match/If-Modified-Since до запуска view.
+
+    scopes_func получает аргументы view и возвращает области кэша,
+    от которых зависит страница, или None, если проверку надо
+    пропустить. Свежесть определяется версиями областей из кэша,
+    поэтому проверка не делает запросов к базе сверх scopes_func.
+    Ключи версий заводятся только для успешного ответа, чтобы
+    адреса несуществующих страниц не засоряли кэш.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = scopes_func(*args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            state = feed_state(*scopes, create=False)
+            response = None
+            if state is not None:
+                response = get_conditional_response(
+                    request,
+                    etag=page_etag(request, state[0]),
+                    last_modified=int(state[1]),
+                )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if 200 <= response.status_code < 300 or (
+                response.status_code == 304
+            ):
+                if state is None:
+                    state = feed_state(*scopes)
+                version, modified = state
+                response.setdefault('ETag', page_etag(request, version))
+                response.setdefault('Last-Modified', http_date(int(modified)))
+                # Страница зависит от пользователя: общие кэши её
+                # не хранят, браузер переспрашивает каждый раз.
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from tasks.queue import task
+
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+def author_stats(user):
+    """Счётчики автора; для автора без записи — нулевые."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def change_author_counter(user_id, field, delta):
+    """Атомарно меняет счётчик автора на delta."""
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if not stats.update(**{field: F(field) + delta}):
+        AuthorStats.objects.get_or_create(user_id=user_id)
+        stats.update(**{field: F(field) + delta})
+
+
+def change_comment_counter(post_id, delta):
+    """Атомарно меняет счётчик комментариев поста на delta."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comment_count__gte=-delta)
+    posts.update(comment_count=F('comment_count') + delta)
+
+
+def _count(queryset, field):
+    """Подзапрос COUNT(*) по строкам queryset, связанным с внешней."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0,
+    )
+
+
+@task(priority=-10)
+def reconcile_counters():
+    """Пересчитывает все счётчики несколькими UPDATE-запросами.
+
+    Возвращает количество обновлённых записей авторов и постов.
+    """
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id) for user_id in missing],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    authors = AuthorStats.objects.update(
+        post_count=_count(
+            Post.objects.filter(author=OuterRef('user')), 'author'
+        ),
+        follower_count=_count(
+            Follow.objects.filter(author=OuterRef('user')), 'author'
+        ),
+        following_count=_count(
+            Follow.objects.filter(user=OuterRef('user')), 'user'
+        ),
+    )
+    posts = Post.objects.update(comment_count=_count(
+        Comment.objects.filter(post=OuterRef('pk')), 'post'
+    ))
+    return authors, posts
@@ -1,5 +1,10 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
 
+from .images import optimize_upload, read_image_header
 from .models import Comment, Post
 
 
@@ -20,6 +25,28 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Текст поста отсутствует!')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        if image.size > settings.POSTS_IMAGE_MAX_UPLOAD_SIZE:
+            raise forms.ValidationError(
+                'Файл слишком большой, максимум '
+                f'{filesizeformat(settings.POSTS_IMAGE_MAX_UPLOAD_SIZE)}.'
+            )
+        try:
+            (width, height), _ = read_image_header(image)
+            if width * height > settings.POSTS_IMAGE_MAX_PIXELS:
+                raise forms.ValidationError(
+                    f'Слишком большое разрешение картинки: {width}x{height}.'
+                )
+            return optimize_upload(image)
+        except (OSError, Image.DecompressionBombError):
+            # Заголовок прочитался, а данные картинки битые.
+            raise forms.ValidationError(
+                'Не удалось прочитать картинку: файл повреждён.'
+            )
+
 
 class CommentForm(forms.ModelForm):
     """Модель для созданиея нового комментария."""
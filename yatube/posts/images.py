@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Форматы, которые сохраняются как есть; остальные перекодируются в JPEG.
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
+
+
+def read_image_header(file):
+    """Размеры и формат картинки по заголовку, без декодирования."""
+    file.seek(0)
+    with Image.open(file) as image:
+        return image.size, image.format
+
+
+def image_metadata(file):
+    """Размеры, размер в байтах, формат и SHA-256 картинки.
+
+    Файл читается один раз блоками; картинка не декодируется.
+    """
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    (width, height), image_format = read_image_header(file)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': size,
+        'image_format': image_format or '',
+        'image_hash': digest.hexdigest(),
+    }
+
+
+EMPTY_METADATA = {
+    'image_width': None,
+    'image_height': None,
+    'image_size': None,
+    'image_format': '',
+    'image_hash': '',
+}
+
+
+# Хеш картинки, файл которой не читается: такие метаданные не
+# пересчитываются при каждом сохранении поста, их повторит
+# backfill_image_metadata.
+UNREADABLE_HASH = 'unreadable'
+
+
+def field_file_metadata(image):
+    """Метаданные картинки из поля модели.
+
+    Если файл не читается, метаданные пустые, а хеш — UNREADABLE_HASH.
+    """
+    try:
+        if image._committed:
+            with image.storage.open(image.name, 'rb') as file:
+                return image_metadata(file)
+        # Загрузка ещё не записана в хранилище: читаем её из памяти
+        # или временного файла, не закрывая — её сохранит FileField.
+        metadata = image_metadata(image.file)
+        image.file.seek(0)
+        return metadata
+    except (OSError, SuspiciousFileOperation, Image.DecompressionBombError):
+        logger.warning('Не удалось прочитать картинку %s', image.name)
+        return dict(EMPTY_METADATA, image_hash=UNREADABLE_HASH)
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    quality = settings.POSTS_IMAGE_QUALITY
+    if image_format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(
+            buffer, 'JPEG', quality=quality, optimize=True, progressive=True
+        )
+    elif image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=quality)
+    else:
+        image.save(buffer, image_format, optimize=True)
+    return buffer.getvalue()
+
+
+def optimize_upload(uploaded):
+    """Уменьшает и перекодирует загруженную картинку.
+
+    Картинка декодируется один раз (для JPEG сразу в уменьшенном
+    масштабе через draft), поворачивается по EXIF, вписывается
+    в POSTS_IMAGE_MAX_SIDE и сохраняется без метаданных.
+    """
+    max_side = settings.POSTS_IMAGE_MAX_SIDE
+    uploaded.seek(0)
+    with Image.open(uploaded) as source:
+        image_format = source.format
+        if image_format not in CONTENT_TYPES:
+            image_format = 'JPEG'
+        if source.format == 'JPEG':
+            source.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((max_side, max_side))
+        content = _encode(image, image_format)
+    name = os.path.splitext(os.path.basename(uploaded.name))[0]
+    optimized = SimpleUploadedFile(
+        name + EXTENSIONS[image_format],
+        content,
+        content_type=CONTENT_TYPES[image_format],
+    )
+    logger.info(
+        'Картинка %s: %d -> %d байт, сэкономлено %d',
+        optimized.name, uploaded.size, optimized.size,
+        uploaded.size - optimized.size,
+        extra={
+            'image_name': optimized.name,
+            'bytes_uploaded': uploaded.size,
+            'bytes_stored': optimized.size,
+            'bytes_saved': uploaded.size - optimized.size,
+        },
+    )
+    return optimized
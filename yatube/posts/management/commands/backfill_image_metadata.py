@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from posts.images import UNREADABLE_HASH, image_metadata
+from posts.models import Post
+
+# Не больше стольких id в одном UPDATE ... WHERE id IN (...).
+UPDATE_CHUNK_SIZE = 500
+
+
+def read_metadata(name):
+    """Метаданные файла из хранилища; выполняется в процессе пула.
+
+    Возвращает (name, metadata, error). Ошибка одного файла
+    не должна прерывать обработку остальных.
+    """
+    try:
+        with default_storage.open(name, 'rb') as file:
+            return name, image_metadata(file), None
+    except Exception as error:
+        return name, None, f'{type(error).__name__}: {error}'
+
+
+class Command(BaseCommand):
+    """Заполняет метаданные картинок у существующих постов."""
+
+    help = (
+        'Читает картинки постов без метаданных пулом процессов и '
+        'сохраняет размеры, размер файла, формат и SHA-256.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессов в пуле; 0 — читать в текущем процессе.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Картинок в одной транзакции обновления.',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать метаданные и у постов, где они уже есть.',
+        )
+
+    def image_posts(self, refresh):
+        """Посты по картинкам: {имя картинки: [id постов]}.
+
+        Одна картинка бывает у многих постов: файл читается один раз,
+        а обновление идёт по id, так как по image нет индекса.
+        """
+        posts = Post.objects.exclude(image='')
+        if not refresh:
+            posts = posts.filter(image_hash__in=('', UNREADABLE_HASH))
+        images = {}
+        for name, pk in posts.order_by().values_list(
+            'image', 'pk'
+        ).iterator():
+            images.setdefault(name, []).append(pk)
+        return images
+
+    def save(self, results, images):
+        updated = 0
+        with transaction.atomic():
+            for name, metadata in results:
+                pks = images[name]
+                for start in range(0, len(pks), UPDATE_CHUNK_SIZE):
+                    updated += Post.objects.filter(
+                        pk__in=pks[start:start + UPDATE_CHUNK_SIZE]
+                    ).update(**metadata)
+        return updated
+
+    def handle(self, *args, **options):
+        images = self.image_posts(options['all'])
+        names = list(images)
+        workers = options['workers']
+        batch_size = options['batch_size']
+        if workers:
+            # Подключения к базе не должны достаться дочерним процессам.
+            connections.close_all()
+            executor = ProcessPoolExecutor(workers, initializer=django.setup)
+            results = executor.map(
+                read_metadata, names,
+                chunksize=max(len(names) // (workers * 4), 1),
+            )
+        else:
+            executor = None
+            results = map(read_metadata, names)
+        updated = failed = 0
+        batch = []
+        try:
+            for name, metadata, error in results:
+                if metadata is None:
+                    failed += 1
+                    self.stderr.write(f'Не удалось прочитать {name}: {error}')
+                    continue
+                batch.append((name, metadata))
+                if len(batch) >= batch_size:
+                    updated += self.save(batch, images)
+                    batch = []
+        finally:
+            # Прочитанное до сбоя пула тоже сохраняется.
+            updated += self.save(batch, images)
+            if executor is not None:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(names)}, обновлено постов: {updated}, '
+            f'ошибок: {failed}'
+        ))
@@ -0,0 +1,117 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from sorl.thumbnail import default
+
+from posts.models import Post
+from posts.thumbnails import (THUMBNAIL_SIZES, generate_thumbnails,
+                              resolve_variants, thumbnail_variants,
+                              variant_formats)
+from posts.views import MAX_POSTS
+
+# Клиенты: имя, ширина окна в CSS-пикселях, плотность пикселей
+# и форматы, которые понимает браузер.
+CLIENTS = (
+    ('mobile', 360, 2, ('AVIF', 'WEBP', 'JPEG')),
+    ('tablet', 768, 2, ('AVIF', 'WEBP', 'JPEG')),
+    ('desktop', 1280, 1, ('AVIF', 'WEBP', 'JPEG')),
+    ('legacy', 1280, 1, ('JPEG',)),
+)
+
+SIZE_PATTERN = re.compile(r'^(?:\(min-width:\s*(\d+)px\)\s*)?(\d+)(px|vw)$')
+
+
+def slot_width(sizes, viewport):
+    """Ширина слота картинки по атрибуту sizes, как её считает браузер."""
+    for entry in sizes.split(','):
+        match = SIZE_PATTERN.match(entry.strip())
+        if match is None:
+            raise CommandError(f'Не разобрать sizes: {sizes}')
+        min_width, length, unit = match.groups()
+        if min_width is None or viewport >= int(min_width):
+            return int(length) * (viewport / 100 if unit == 'vw' else 1)
+    return viewport
+
+
+def choose_variant(variants, formats, needed):
+    """Вариант, который загрузит браузер из <picture>.
+
+    Первый <source> с понятным формату типом, в нём — самая узкая
+    ширина не меньше нужной, иначе самая широкая.
+    """
+    for image_format in dict.fromkeys(fmt for fmt, _ in variants):
+        if image_format not in formats:
+            continue
+        found = [
+            thumbnail for fmt, thumbnail in variants if fmt == image_format
+        ]
+        wide_enough = [
+            thumbnail for thumbnail in found if thumbnail.width >= needed
+        ]
+        return wide_enough[0] if wide_enough else found[-1]
+    raise CommandError('Клиент не понимает ни один формат вариантов')
+
+
+class Command(BaseCommand):
+    """Сравнивает объём картинок страниц ленты до и после srcset."""
+
+    help = (
+        'Считает байты миниатюр на первых страницах главной ленты: '
+        'одна миниатюра для всех клиентов против варианта, который '
+        'браузер выберет из <picture>/srcset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=5,
+            help='Сколько первых страниц главной ленты учитывать.',
+        )
+        parser.add_argument('--alias', default='card')
+
+    def handle(self, *args, **options):
+        alias = options['alias']
+        pages = options['pages']
+        images = [
+            post.image
+            for post in Post.objects.feed()[:pages * MAX_POSTS]
+            if post.image
+        ]
+        if not images:
+            raise CommandError(
+                'Нет постов с картинками: запустите manage.py generate_data.'
+            )
+        names = [image.name for image in images]
+        for name in set(names):
+            generate_thumbnails(name)
+        variants = resolve_variants(images, alias)
+        # Считаем только картинки, для которых созданы все варианты.
+        expected = len(thumbnail_variants(alias))
+        names = [name for name in names if len(variants[name]) == expected]
+        sizes = {}
+
+        def size(thumbnail):
+            if thumbnail.name not in sizes:
+                sizes[thumbnail.name] = default.storage.size(thumbnail.name)
+            return sizes[thumbnail.name]
+
+        # До: всем клиентам отдавалась сама миниатюра — самый широкий
+        # вариант запасного формата.
+        before = sum(size(variants[name][-1][1]) for name in names) / pages
+        self.stdout.write(
+            'Форматы вариантов: '
+            + ', '.join(variant_formats() + ('JPEG',))
+        )
+        self.stdout.write(
+            f'{"клиент":<10}{"до, КБ":>10}{"после, КБ":>12}{"экономия":>10}'
+        )
+        for client, viewport, density, formats in CLIENTS:
+            needed = slot_width(THUMBNAIL_SIZES[alias], viewport) * density
+            after = sum(
+                size(choose_variant(variants[name], formats, needed))
+                for name in names
+            ) / pages
+            saved = (1 - after / before) * 100 if before else 0
+            self.stdout.write(
+                f'{client:<10}{before / 1024:>10.1f}{after / 1024:>12.1f}'
+                f'{saved:>9.1f}%'
+            )
@@ -0,0 +1,262 @@
+import functools
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import SQLiteCache
+from posts.cache import author_scope, bump_feed_versions
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+COUNTING_BACKEND = 'posts.management.commands.bench_views.CountingSQLiteCache'
+
+
+def counted(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        CountingSQLiteCache.calls += 1
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class CountingSQLiteCache(SQLiteCache):
+    """SQLiteCache, считающий обращения: один вызов — один поход в кэш."""
+
+    calls = 0
+
+    get = counted(SQLiteCache.get)
+    get_many = counted(SQLiteCache.get_many)
+    has_key = counted(SQLiteCache.has_key)
+    set = counted(SQLiteCache.set)
+    set_many = counted(SQLiteCache.set_many)
+    add = counted(SQLiteCache.add)
+    incr = counted(SQLiteCache.incr)
+    touch = counted(SQLiteCache.touch)
+    delete = counted(SQLiteCache.delete)
+    delete_many = counted(SQLiteCache.delete_many)
+
+
+def cache_settings(backend, directory):
+    """CACHES с общим кэшем SQLite, для tiered — с LRU процесса перед ним."""
+    shared = {
+        'BACKEND': COUNTING_BACKEND,
+        'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    }
+    if backend == 'sqlite':
+        return {'default': shared}
+    return {
+        'default': {'BACKEND': 'core.cache.TieredCache', 'LOCATION': 'shared'},
+        'shared': shared,
+    }
+
+
+def write_loop(stop, usernames, interval, seed):
+    """Процесс-писатель: то, что пишут в кэш соседние воркеры.
+
+    Меняет версии лент авторов, как сигналы новых постов, и кладёт
+    фрагменты и закэшированный COUNT, как промахи страниц.
+    """
+    rng = random.Random(seed)
+    step = 0
+    while not stop.is_set():
+        bump_feed_versions(author_scope(rng.choice(usernames)))
+        cache.set(f'fragment:bench:{seed}:{step}', 'x' * 1000, 60)
+        cache.set(f'posts:count:bench:{seed}', step, 60)
+        step += 1
+        time.sleep(interval)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    """Нагрузочный прогон страниц posts через тестовый клиент."""
+
+    help = (
+        'Запрашивает index, group_list, profile, post_detail и '
+        'follow_index и выводит p50/p95 задержки, число SQL-запросов '
+        'и походов в общий кэш.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов на каждую страницу.',
+        )
+        parser.add_argument(
+            '--pages', type=int, default=5,
+            help='Запросы распределяются по первым N страницам ленты.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--max-p95', type=float, default=None,
+            help='Завершиться с ошибкой, если p95 страницы выше (мс).',
+        )
+        parser.add_argument(
+            '--max-queries', type=int, default=None,
+            help='Завершиться с ошибкой, если запросов на страницу больше.',
+        )
+        parser.add_argument(
+            '--cache', choices=('settings', 'sqlite', 'tiered'),
+            default='settings',
+            help=(
+                'Кэш прогона: из настроек, общий SQLite или LRU процесса '
+                'перед ним. Для sqlite и tiered выводится число походов '
+                'в общий кэш на запрос.'
+            ),
+        )
+        parser.add_argument(
+            '--writers', type=int, default=0,
+            help=(
+                'Параллельных процессов, которые пишут в общий кэш '
+                'во время прогона (только с --cache sqlite|tiered).'
+            ),
+        )
+        parser.add_argument(
+            '--write-interval', type=float, default=0.01,
+            help='Пауза писателя между записями, с.',
+        )
+
+    def targets(self):
+        group = Group.objects.annotate(
+            count=Count('posts')
+        ).order_by('-count').first()
+        author = User.objects.order_by('-stats__post_count').first()
+        post = Post.objects.order_by('-comment_count').first()
+        follower = User.objects.order_by('-stats__following_count').first()
+        if not (group and author and post and follower):
+            raise CommandError(
+                'Недостаточно данных: запустите manage.py generate_data.'
+            )
+        if not Follow.objects.filter(user=follower).exists():
+            follower = author
+        return (
+            ('index', reverse('posts:index'), None),
+            ('group_list', reverse(
+                'posts:group_list', kwargs={'slug': group.slug}
+            ), None),
+            ('profile', reverse(
+                'posts:profile', kwargs={'username': author.username}
+            ), None),
+            ('post_detail', reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            ), None),
+            ('follow_index', reverse('posts:follow_index'), follower),
+        )
+
+    def measure(self, client, url, options):
+        timings = []
+        queries = []
+        cache_calls = []
+        for i in range(options['requests']):
+            page_url = f'{url}?page={i % options["pages"] + 1}'
+            if options['cold']:
+                cache.clear()
+            CountingSQLiteCache.calls = 0
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(page_url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{page_url} ответил {response.status_code}'
+                )
+            queries.append(len(captured))
+            cache_calls.append(CountingSQLiteCache.calls)
+        return timings, queries, cache_calls
+
+    def handle(self, *args, **options):
+        with ExitStack() as stack:
+            if options['cache'] != 'settings':
+                directory = stack.enter_context(tempfile.TemporaryDirectory())
+                stack.enter_context(override_settings(
+                    CACHES=cache_settings(options['cache'], directory)
+                ))
+            if options['writers']:
+                stack.enter_context(self.writers(options))
+            self.run(options)
+
+    @contextmanager
+    def writers(self, options):
+        """Запускает процессы-писатели на время прогона."""
+        if options['cache'] == 'settings':
+            raise CommandError(
+                '--writers нужен общий кэш: --cache sqlite|tiered'
+            )
+        usernames = list(
+            User.objects.values_list('username', flat=True)[:100]
+        )
+        # fork: писатели наследуют переопределённые CACHES.
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        processes = [
+            context.Process(
+                target=write_loop,
+                args=(stop, usernames, options['write_interval'], seed),
+                daemon=True,
+            )
+            for seed in range(options['writers'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            for process in processes:
+                process.join()
+
+    def run(self, options):
+        failures = []
+        self.stdout.write(
+            f'{"страница":<14}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запросов":>10}{"макс.":>8}{"кэш":>8}'
+        )
+        for name, url, user in self.targets():
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            timings, queries, cache_calls = self.measure(
+                client, url, options
+            )
+            p50 = percentile(timings, 50)
+            p95 = percentile(timings, 95)
+            calls = '-'
+            if options['cache'] != 'settings':
+                calls = f'{sum(cache_calls) / len(cache_calls):.1f}'
+            self.stdout.write(
+                f'{name:<14}{p50:>10.1f}{p95:>10.1f}'
+                f'{sum(queries) / len(queries):>10.1f}{max(queries):>8}'
+                f'{calls:>8}'
+            )
+            if options['max_p95'] is not None and p95 > options['max_p95']:
+                failures.append(f'{name}: p95 {p95:.1f} мс')
+            if (
+                options['max_queries'] is not None
+                and max(queries) > options['max_queries']
+            ):
+                failures.append(f'{name}: {max(queries)} запросов')
+        if failures:
+            raise CommandError('Превышены пороги: ' + ', '.join(failures))
@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts.models import (FOLLOW_CURSOR_KEYS, Comment, Follow, Group, Post,
+                          TimelineEntry)
+from posts.utils import CursorPaginator
+
+User = get_user_model()
+
+PAGE_SIZE = 10
+
+
+class Rollback(Exception):
+    """Откатывает удаление индексов после сравнения планов."""
+
+
+class Command(BaseCommand):
+    """Выводит планы запросов лент (EXPLAIN QUERY PLAN на SQLite)."""
+
+    help = (
+        'Показывает планы запросов лент. С --compare дополнительно '
+        'показывает планы без индексов лент (удаляются в транзакции '
+        'и возвращаются откатом).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Сравнить с планами без индексов лент.',
+        )
+
+    def feed_querysets(self):
+        """Запросы, которые выполняют пагинаторы лент.
+
+        Для каждой ленты — первая страница и страница по курсору:
+        условие по позиции (pub_date, id) и порядок (-pub_date, -pk),
+        у ленты подписок — по тем же полям записи TimelineEntry.
+        """
+        user = User.objects.first()
+        group = Group.objects.first()
+        post = Post.objects.first()
+        user_id = user.pk if user else 1
+        position = (
+            (post.pub_date, post.pk) if post else (timezone.now(), 1)
+        )
+        keys = ('pub_date', 'pk')
+        feeds = (
+            ('index', Post.objects.feed(), keys),
+            ('group_list', Post.objects.feed().filter(
+                group_id=group.pk if group else 1
+            ), keys),
+            ('profile', Post.objects.feed().filter(author_id=user_id), keys),
+            ('follow_index', Post.objects.feed().followed_by(user_id),
+             FOLLOW_CURSOR_KEYS),
+        )
+        for name, queryset, keys in feeds:
+            paginator = CursorPaginator(queryset, PAGE_SIZE, keys=keys)
+            yield name, paginator.page_queryset()
+            yield f'{name} (cursor)', paginator.page_queryset(position)
+        comments = CursorPaginator(
+            Comment.objects.filter(post_id=post.pk if post else 1),
+            PAGE_SIZE, descending=False,
+        )
+        yield 'comments', comments.page_queryset()
+        yield 'following', Follow.objects.filter(
+            user_id=user_id, author_id=user_id
+        )
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        prefix = (
+            'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite'
+            else 'EXPLAIN'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' '.join(map(str, row)) for row in cursor.fetchall()]
+
+    def write_plans(self, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in self.feed_querysets():
+            self.stdout.write(self.style.MIGRATE_LABEL(f'  {name}'))
+            for line in self.explain(queryset):
+                self.stdout.write(f'    {line}')
+
+    def handle(self, *args, **options):
+        if not options['compare']:
+            self.write_plans('Планы запросов лент:')
+            return
+        index_names = [
+            index.name
+            for model in (Post, Comment, Follow, TimelineEntry)
+            for index in model._meta.indexes
+        ]
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for name in index_names:
+                        cursor.execute(
+                            f'DROP INDEX {connection.ops.quote_name(name)}'
+                        )
+                self.write_plans('До (без индексов лент):')
+                raise Rollback
+        except Rollback:
+            pass
+        self.write_plans('После (с индексами лент):')
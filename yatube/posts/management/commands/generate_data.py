@@ -0,0 +1,223 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts.cache import GLOBAL_SCOPE, bump_feed_versions
+from posts.counters import reconcile_counters
+from posts.images import EMPTY_METADATA, image_metadata
+from posts.models import Comment, Follow, Group, Post
+from posts.search import rebuild_index
+from posts.timeline import rebuild_timelines
+
+User = get_user_model()
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+
+
+class Command(BaseCommand):
+    """Генерирует большой объём тестовых данных bulk-вставками."""
+
+    help = (
+        'Создаёт пользователей, группы, посты с картинками, комментарии '
+        'и граф подписок со степенным распределением.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Показатель степенного закона популярности авторов.',
+        )
+        parser.add_argument(
+            '--images', type=int, default=10,
+            help='Сколько разных картинок сгенерировать для постов.',
+        )
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.3,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Объектов в одной пачке вставки и транзакции.',
+        )
+        parser.add_argument('--seed', type=int, default=None)
+
+    def insert(self, model, objects, dated=False):
+        """Вставляет объекты пачками по batch_size, каждую в транзакции.
+
+        objects — генератор: в памяти держится только текущая пачка.
+        С dated пачке после вставки раскладываются даты публикации.
+        """
+        objects = iter(objects)
+        total = 0
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+                if dated:
+                    self.spread_dates(model, batch)
+            total += len(batch)
+        self.stdout.write(f'  {model.__name__}: {total}')
+
+    def spread_dates(self, model, objects):
+        """Раскладывает pub_date по периоду: bulk_create их перезаписал."""
+        for obj in objects:
+            obj.pub_date = self.now - timedelta(
+                seconds=self.random.uniform(0, self.period)
+            )
+        model.objects.bulk_update(objects, ['pub_date'])
+
+    def make_images(self, count):
+        """Сохраняет картинки; возвращает {имя файла: метаданные}."""
+        images = {}
+        for i in range(count):
+            buffer = BytesIO()
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new('RGB', (1280, 720), color).save(buffer, 'JPEG')
+            name = default_storage.save(
+                f'posts/generated-{i}.jpg', ContentFile(buffer.getvalue())
+            )
+            images[name] = image_metadata(buffer)
+        return images
+
+    def make_users(self, count):
+        start = next_id(User)
+        password = make_password(None)
+        self.insert(User, (
+            User(
+                pk=start + i,
+                username=f'{self.fake.user_name()}-{start + i}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for i in range(count)
+        ))
+        return range(start, start + count)
+
+    def make_groups(self, count):
+        start = next_id(Group)
+        self.insert(Group, (
+            Group(
+                pk=start + i,
+                title=self.fake.sentence(nb_words=3)[:200],
+                slug=f'group-{start + i}',
+                description=self.fake.paragraph(),
+            )
+            for i in range(count)
+        ))
+        return range(start, start + count)
+
+    def make_posts(self, count, user_ids, group_ids, images, image_ratio):
+        if not user_ids:
+            return range(0)
+        start = next_id(Post)
+        names = list(images)
+
+        def posts():
+            for i in range(count):
+                image = ''
+                if names and self.random.random() < image_ratio:
+                    image = self.random.choice(names)
+                yield Post(
+                    pk=start + i,
+                    text=self.fake.paragraph(nb_sentences=5),
+                    author_id=self.random.choice(user_ids),
+                    group_id=(
+                        self.random.choice(group_ids)
+                        if group_ids and self.random.random() < 0.7
+                        else None
+                    ),
+                    image=image,
+                    **images.get(image, EMPTY_METADATA),
+                )
+
+        self.insert(Post, posts(), dated=True)
+        return range(start, start + count)
+
+    def make_comments(self, count, user_ids, post_ids):
+        start = next_id(Comment)
+        self.insert(Comment, (
+            Comment(
+                pk=start + i,
+                post_id=self.random.choice(post_ids),
+                author_id=self.random.choice(user_ids),
+                text=self.fake.sentence(),
+            )
+            for i in range(count)
+        ), dated=True)
+
+    def make_follows(self, user_ids, average, alpha):
+        """Подписки: популярность автора падает как 1 / rank^alpha."""
+        authors = list(user_ids)
+        self.random.shuffle(authors)
+        weights = [1 / (rank + 1) ** alpha for rank in range(len(authors))]
+
+        def follows():
+            for user_id in user_ids:
+                count = min(
+                    int(self.random.expovariate(1 / average))
+                    if average else 0,
+                    len(authors) - 1,
+                )
+                followed = set(self.random.choices(authors, weights, k=count))
+                followed.discard(user_id)
+                for author_id in followed:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, follows())
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days']).total_seconds()
+
+        images = self.make_images(options['images'])
+        user_ids = self.make_users(options['users'])
+        group_ids = self.make_groups(options['groups'])
+        post_ids = self.make_posts(
+            options['posts'], user_ids, group_ids,
+            images, options['image_ratio'],
+        )
+        if post_ids and user_ids:
+            self.make_comments(options['comments'], user_ids, post_ids)
+        self.make_follows(user_ids, options['follows'], options['alpha'])
+
+        # bulk_create не отправляет сигналы: досчитываем производные данные.
+        reconcile_counters()
+        rebuild_index()
+        for start in range(0, len(user_ids), self.batch_size):
+            rebuild_timelines(user_ids[start:start + self.batch_size])
+        bump_feed_versions(GLOBAL_SCOPE)
+        if connection.vendor == 'sqlite':
+            # Статистика для планировщика и оценки числа строк в админке.
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """Перестраивает полнотекстовый индекс постов."""
+
+    help = (
+        'Заново заполняет индекс поиска по текстам постов, например '
+        'после bulk-вставок, которые не отправляют сигналы.'
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {count}'
+        ))
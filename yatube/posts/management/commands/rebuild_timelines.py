@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    """Пересобирает материализованные ленты подписок."""
+
+    help = 'Пересобирает ленты подписок (TimelineEntry) с нуля.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            type=int,
+            dest='user_ids',
+            help='id подписчика; можно указать несколько раз.',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_timelines(options['user_ids'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Ленты пересобраны, подписок: {count}')
+        )
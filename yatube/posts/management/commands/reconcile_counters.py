@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_counters
+from tasks.queue import enqueue
+
+
+class Command(BaseCommand):
+    """Пересчитывает денормализованные счётчики."""
+
+    help = (
+        'Пересчитывает счётчики постов, подписчиков, подписок '
+        'и комментариев.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить пересчёт в очередь задач вместо выполнения.',
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            enqueue(reconcile_counters, dedup_key='reconcile_counters')
+            self.stdout.write(
+                self.style.SUCCESS('Пересчёт поставлен в очередь')
+            )
+            return
+        authors, posts = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано авторов: {authors}, постов: {posts}'
+        ))
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F
 
 from core.models import CreatedModel
 
@@ -17,6 +19,56 @@ class Group(models.Model):
         return f'Группа {self.title}'
 
 
+# Поля курсора ленты подписок, см. PostQuerySet.followed_by.
+FOLLOW_CURSOR_KEYS = ('feed_date', 'feed_post')
+
+
+class PostQuerySet(models.QuerySet):
+    """QuerySet постов с выборками для лент."""
+
+    def feed(self):
+        """Посты для карточек ленты.
+
+        Автор и группа подтягиваются одним JOIN, а из таблиц
+        берутся только поля, которые выводят шаблоны карточек.
+        """
+        return self.select_related('author', 'group').only(
+            'id',
+            'text',
+            'pub_date',
+            'image',
+            'image_width',
+            'image_height',
+            'author__id',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__id',
+            'group__title',
+            'group__slug',
+        )
+
+    def followed_by(self, user):
+        """Посты авторов, на которых подписан user.
+
+        При включённой POSTS_FOLLOW_TIMELINE читается
+        материализованная лента TimelineEntry: диапазон по индексу
+        (user, -pub_date, -post) вместо соединения с подписками.
+        Дата и id поста для порядка и курсора (FOLLOW_CURSOR_KEYS)
+        берутся из той же записи ленты, иначе SQLite сортирует
+        всю ленту во временном B-дереве.
+        """
+        if settings.POSTS_FOLLOW_TIMELINE:
+            # annotate после filter использует то же соединение.
+            return self.filter(timeline_entries__user=user).annotate(
+                feed_date=F('timeline_entries__pub_date'),
+                feed_post=F('timeline_entries__post_id'),
+            ).order_by('-feed_date', '-feed_post')
+        return self.filter(author__following__user=user).annotate(
+            feed_date=F('pub_date'), feed_post=F('pk'),
+        )
+
+
 class Post(CreatedModel):
     """Модель постов."""
 
@@ -44,15 +96,73 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    # Метаданные картинки заполняются при сохранении поста,
+    # чтобы страницам не приходилось открывать файл.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер картинки в байтах', null=True, blank=True, editable=False
+    )
+    image_format = models.CharField(
+        'Формат картинки', max_length=10, blank=True, editable=False
+    )
+    image_hash = models.CharField(
+        'SHA-256 картинки', max_length=64, blank=True, editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    # Меняются только атомарными UPDATE из posts.counters.
+    COUNTER_FIELDS = ('comment_count',)
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-pk')
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            # Совпадают с порядком лент (-pub_date, -id), по которому
+            # идут и нумерованные, и курсорные страницы.
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        """Сохраняет пост, не перезаписывая счётчики существующей строки.
+
+        Иначе значение, прочитанное в начале запроса, затёрло бы
+        параллельные F()-обновления счётчиков.
+        """
+        if not self._state.adding and not kwargs.get('force_insert') and (
+            kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(CreatedModel):
     """Модель комментариев."""
@@ -74,6 +184,13 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'], name='comment_post_date_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     """Модель для подписок."""
@@ -98,3 +215,72 @@ class Follow(models.Model):
                 fields=['author_id', 'user_id'], name='unique follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='follow_user_author_idx'
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора.
+
+    Обновляются сигналами через F()-выражения, расхождения
+    исправляет команда reconcile_counters.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    post_count = models.PositiveIntegerField('Постов', default=0)
+    follower_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'Статистика {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок.
+
+    Заполняется при публикации поста для каждого подписчика автора,
+    дополняется при подписке и чистится при отписке.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique timeline entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_post_idx',
+            )
+        ]
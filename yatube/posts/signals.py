@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import (GLOBAL_SCOPE, author_scope, bump_feed_versions,
+                    group_scope, post_feed_scopes, post_scope)
+from .counters import change_author_counter, change_comment_counter
+from .images import EMPTY_METADATA, field_file_metadata
+from .models import Comment, Follow, Group, Post, User
+from .search import index_post, unindex_post
+from .thumbnails import schedule_thumbnails
+from .timeline import backfill_timeline, fan_out_post, prune_timeline
+
+
+def bump_after_commit(*scopes):
+    """Сбрасывает версии областей сейчас и ещё раз после фиксации.
+
+    Внутри транзакции читатель может закэшировать под новой версией
+    данные без незафиксированных изменений; повторный сброс после
+    COMMIT делает такой кэш недействительным.
+    """
+    bump_feed_versions(*scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_feed_versions(*scopes))
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, **kwargs):
+    """Запоминает ленты, картинку и текст поста до сохранения."""
+    instance._previous_feed_scopes = []
+    instance._previous_image = None
+    instance._previous_text = None
+    if instance.pk is None:
+        return
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'author__username', 'group__slug', 'image', 'text'
+    ).first()
+    if previous is not None:
+        instance._previous_feed_scopes = post_feed_scopes(*previous[:2])
+        instance._previous_image = previous[2]
+        instance._previous_text = previous[3]
+
+
+@receiver(pre_save, sender=Post)
+def fill_image_metadata(sender, instance, **kwargs):
+    """Сохраняет размеры, формат и хеш новой картинки поста."""
+    image = instance.image
+    if not image:
+        for field, value in EMPTY_METADATA.items():
+            setattr(instance, field, value)
+        return
+    if image.name == instance._previous_image and instance.image_hash:
+        return
+    metadata = field_file_metadata(image)
+    for field, value in metadata.items():
+        setattr(instance, field, value)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, **kwargs):
+    """Ставит в фон создание миниатюр новой картинки поста."""
+    image_name = instance.image.name
+    if image_name and image_name != getattr(instance, '_previous_image', None):
+        schedule_thumbnails(image_name, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, **kwargs):
+    """Обновляет пост в поисковом индексе, если изменился текст."""
+    if instance.text != getattr(instance, '_previous_text', None):
+        index_post(instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    """Убирает удалённый пост из поискового индекса."""
+    unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    """Сбрасывает кэш лент, где выводится название группы."""
+    bump_after_commit(GLOBAL_SCOPE, group_scope(instance.slug))
+
+
+@receiver(post_save, sender=Post)
+def add_post_to_timelines(sender, instance, created, **kwargs):
+    """Раскладывает новый пост по лентам подписчиков."""
+    if created and settings.POSTS_FOLLOW_TIMELINE:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follower_timeline(sender, instance, created, **kwargs):
+    """Добавляет посты автора в ленту нового подписчика."""
+    if created and settings.POSTS_FOLLOW_TIMELINE:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_follower_timeline(sender, instance, **kwargs):
+    """Убирает посты автора из ленты отписавшегося."""
+    if settings.POSTS_FOLLOW_TIMELINE:
+        prune_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def increment_post_count(sender, instance, created, **kwargs):
+    """Учитывает новый пост в счётчике автора."""
+    if created:
+        change_author_counter(instance.author_id, 'post_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def decrement_post_count(sender, instance, **kwargs):
+    """Учитывает удаление поста в счётчике автора."""
+    change_author_counter(instance.author_id, 'post_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    """Учитывает новый комментарий в счётчике поста."""
+    if created:
+        change_comment_counter(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    """Учитывает удаление комментария в счётчике поста."""
+    change_comment_counter(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def increment_follow_counts(sender, instance, created, **kwargs):
+    """Учитывает подписку в счётчиках автора и подписчика."""
+    if created:
+        change_author_counter(instance.author_id, 'follower_count', 1)
+        change_author_counter(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_follow_counts(sender, instance, **kwargs):
+    """Учитывает отписку в счётчиках автора и подписчика."""
+    change_author_counter(instance.author_id, 'follower_count', -1)
+    change_author_counter(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_page(sender, instance, **kwargs):
+    """Страница поста устаревает при изменении комментариев."""
+    bump_after_commit(post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    """Сбрасывает кэш лент, в которых пост был или появился.
+
+    Подключён после раскладки по лентам подписок и счётчиков: иначе
+    запрос между сбросом и их обновлением закэширует ленты без поста.
+    """
+    scopes = set(getattr(instance, '_previous_feed_scopes', ()))
+    scopes.update(post_feed_scopes(
+        instance.author.username,
+        instance.group.slug if instance.group_id else None,
+    ))
+    scopes.add(post_scope(instance.pk))
+    bump_after_commit(*scopes)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_profiles(sender, instance, **kwargs):
+    """Профили автора и подписчика показывают подписки и счётчики.
+
+    Область подписчика входит в ленту его подписок, поэтому сброс
+    подключён после изменения материализованной ленты и счётчиков.
+    """
+    usernames = User.objects.filter(
+        pk__in=(instance.user_id, instance.author_id)
+    ).values_list('username', flat=True)
+    bump_after_commit(
+        *(author_scope(username) for username in usernames)
+    )
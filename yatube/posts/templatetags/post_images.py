@@ -0,0 +1,110 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+
+from ..thumbnails import (FALLBACK_FORMAT, SOURCE_TYPES, THUMBNAIL_SIZES,
+                          cached_thumbnail, resolve_variants,
+                          schedule_thumbnails, thumbnail_failed,
+                          thumbnail_name)
+
+register = template.Library()
+
+PAGE_THUMBNAILS = 'page_thumbnails'
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_thumbnails(context, posts, alias='card'):
+    """Разрешает миниатюры всех постов страницы одной пачкой.
+
+    Результат читают следующие за ним thumbnail_url и picture.
+    """
+    variants = resolve_variants(
+        (post.image for post in posts), alias
+    )
+    resolved = dict(context.get(PAGE_THUMBNAILS) or {})
+    resolved.update(
+        ((name, alias), found) for name, found in variants.items()
+    )
+    context[PAGE_THUMBNAILS] = resolved
+    return ''
+
+
+@register.simple_tag(takes_context=True)
+def thumbnail_url(context, image, alias='card'):
+    """URL готовой миниатюры.
+
+    Шаблон только читает KV-store: если миниатюры ещё нет, её создание
+    ставится в фон, а вместо картинки выводится заглушка. Миниатюры,
+    разрешённые prefetch_thumbnails, берутся без обращений к KV-store.
+    """
+    if not image:
+        return ''
+    resolved = context.get(PAGE_THUMBNAILS) or {}
+    if (image.name, alias) in resolved:
+        name = thumbnail_name(image, alias)
+        for _, thumbnail in resolved[image.name, alias]:
+            if thumbnail.name == name:
+                return thumbnail.url
+        return static(settings.POSTS_THUMBNAIL_PLACEHOLDER)
+    thumbnail = cached_thumbnail(image, alias)
+    if thumbnail is not None:
+        return thumbnail.url
+    if not thumbnail_failed(image.name):
+        schedule_thumbnails(image.name, image.instance.pk)
+    return static(settings.POSTS_THUMBNAIL_PLACEHOLDER)
+
+
+def srcset(thumbnails):
+    return ', '.join(
+        f'{thumbnail.url} {thumbnail.width}w' for thumbnail in thumbnails
+    )
+
+
+@register.inclusion_tag('posts/includes/picture.html', takes_context=True)
+def picture(context, image, alias='card', css_class=''):
+    """Разметка <picture> с вариантами миниатюры по форматам и ширинам.
+
+    Браузер выбирает формат по <source type> и ширину по srcset/sizes,
+    <img> получает запасной формат. Выводятся уже созданные варианты,
+    недостающие ставятся в фон; если готова только сама миниатюра,
+    выводится обычный <img>, а заглушка — пока нет ни одного варианта.
+    """
+    if not image:
+        return {}
+    resolved = context.get(PAGE_THUMBNAILS) or {}
+    if (image.name, alias) in resolved:
+        variants = resolved[image.name, alias]
+    else:
+        variants = resolve_variants([image], alias)[image.name]
+    placeholder = {
+        'css_class': css_class,
+        'src': static(settings.POSTS_THUMBNAIL_PLACEHOLDER),
+    }
+    if not variants:
+        return placeholder
+    by_format = {}
+    for image_format, thumbnail in variants:
+        by_format.setdefault(image_format, []).append(thumbnail)
+    fallback = by_format.pop(FALLBACK_FORMAT, [])
+    if not by_format and len(fallback) == 1:
+        return dict(
+            placeholder, src=fallback[0].url,
+            width=fallback[0].width, height=fallback[0].height,
+        )
+    markup = dict(
+        placeholder,
+        sources=[
+            {'type': SOURCE_TYPES[image_format], 'srcset': srcset(found)}
+            for image_format, found in by_format.items()
+        ],
+        sizes=THUMBNAIL_SIZES[alias],
+        picture=True,
+    )
+    if fallback:
+        markup.update(
+            src=fallback[-1].url,
+            srcset=srcset(fallback),
+            width=fallback[-1].width,
+            height=fallback[-1].height,
+        )
+    return markup
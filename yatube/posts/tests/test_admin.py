@@ -0,0 +1,87 @@
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..cache import GLOBAL_SCOPE, feed_versions, group_scope
+from ..models import Group, Post
+from ..utils import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    """Проверка списка постов в админке."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.group = Group.objects.create(
+            title='Старая группа', slug='old', description='Описание'
+        )
+        cls.new_group = Group.objects.create(
+            title='Новая группа', slug='new', description='Описание'
+        )
+        for i in range(30):
+            author = User.objects.create_user(username=f'author-{i}')
+            Post.objects.create(
+                author=author, text=f'Пост {i}', group=cls.group
+            )
+        cls.changelist_url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries(self):
+        """Список не зависит от числа строк и не делает полный COUNT."""
+        self.client.get(self.changelist_url)
+        with self.assertNumQueries(7) as captured:
+            response = self.client.get(self.changelist_url)
+        self.assertEqual(response.status_code, 200)
+        counts = [
+            query['sql'] for query in captured.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+        self.assertEqual(len(counts), 1)
+
+    def test_estimated_count(self):
+        """Без фильтров число строк берётся из статистики."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, Post.objects.count())
+        limited = EstimatedCountPaginator(
+            Post.objects.filter(group=self.group), 10, count_limit=5
+        )
+        self.assertEqual(limited.count, 5)
+
+    def test_move_to_group(self):
+        """Действие переносит посты одним UPDATE и сбрасывает кэш лент."""
+        posts = list(Post.objects.values_list('pk', flat=True)[:3])
+        scopes = (GLOBAL_SCOPE, group_scope(self.new_group.slug))
+        versions = feed_versions(*scopes)
+        data = {
+            'action': 'move_to_group',
+            'index': 0,
+            ACTION_CHECKBOX_NAME: posts,
+        }
+        response = self.client.post(self.changelist_url, data)
+        self.assertTemplateUsed(
+            response, 'admin/posts/post/move_to_group.html'
+        )
+        response = self.client.post(
+            self.changelist_url,
+            {**data, 'apply': '1', 'group': self.new_group.pk},
+        )
+        self.assertRedirects(response, self.changelist_url)
+        self.assertEqual(
+            Post.objects.filter(group=self.new_group).count(), len(posts)
+        )
+        self.assertNotEqual(feed_versions(*scopes), versions)
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..cache import GLOBAL_SCOPE, CachedQuery, author_scope, group_scope
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class CachedQueryTest(TestCase):
+    """Проверка кэша выборок лент по версиям областей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(5):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def page_ids(self, queryset, scopes):
+        return [post.pk for post in CachedQuery(queryset, scopes)[0:3]]
+
+    def test_page_hydrated_with_one_query(self):
+        """Закэшированная страница загружается одним in_bulk()."""
+        queryset = Post.objects.feed()
+        expected = self.page_ids(queryset, (GLOBAL_SCOPE,))
+        with self.assertNumQueries(0):
+            rows = CachedQuery(queryset, (GLOBAL_SCOPE,))[0:3]
+            self.assertEqual(len(rows), 3)
+        with self.assertNumQueries(1):
+            self.assertEqual([post.pk for post in rows], expected)
+        self.assertEqual(rows[0].author.username, 'author')
+
+    def test_count_cached(self):
+        """Число записей берётся из кэша до изменения области."""
+        queryset = Post.objects.feed()
+        self.assertEqual(CachedQuery(queryset, (GLOBAL_SCOPE,)).count(), 5)
+        with self.assertNumQueries(0):
+            CachedQuery(queryset, (GLOBAL_SCOPE,)).count()
+
+    def test_new_post_invalidates_feeds(self):
+        """Новый пост сбрасывает кэш общей ленты, группы и автора."""
+        feeds = (
+            (Post.objects.feed(), (GLOBAL_SCOPE,)),
+            (self.group.posts.feed(), (group_scope(self.group.slug),)),
+            (self.author.posts.feed(), (author_scope('author'),)),
+        )
+        for queryset, scopes in feeds:
+            self.page_ids(queryset, scopes)
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост'
+        )
+        for queryset, scopes in feeds:
+            with self.subTest(scopes=scopes):
+                self.assertEqual(self.page_ids(queryset, scopes)[0], post.pk)
+
+    def test_follow_invalidates_follow_feed(self):
+        """Подписка сбрасывает кэш ленты подписок."""
+        scopes = (GLOBAL_SCOPE, author_scope('reader'))
+        queryset = Post.objects.feed().followed_by(self.reader)
+        self.assertEqual(self.page_ids(queryset, scopes), [])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(len(self.page_ids(queryset, scopes)), 3)
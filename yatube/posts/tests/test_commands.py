@@ -0,0 +1,255 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from ..images import UNREADABLE_HASH, image_metadata
+from ..models import AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class LoadCommandsTest(TestCase):
+    """Проверка генератора данных и нагрузочного прогона."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_data',
+            users=20,
+            groups=3,
+            posts=60,
+            comments=40,
+            follows=5,
+            images=2,
+            seed=1,
+            stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate_data(self):
+        """Генератор создаёт данные и досчитывает производные."""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('post_count', flat=True)), 60
+        )
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            Post.objects.filter(author__following__isnull=False).count()
+        )
+        self.assertFalse(
+            Follow.objects.filter(user_id=F('author_id')).exists()
+        )
+
+    def test_generate_data_in_batches(self):
+        """Объекты вставляются пачками по batch_size."""
+        before = Post.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                'generate_data', users=3, groups=1, posts=20, comments=15,
+                follows=1, images=0, batch_size=7, seed=2,
+                stdout=StringIO(),
+            )
+        inserts = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('INSERT INTO "posts_post"')
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(Post.objects.count(), before + 20)
+        new_posts = Post.objects.order_by('-pk')[:20]
+        self.assertEqual(len({post.pub_date for post in new_posts}), 20)
+
+    def test_explain_feeds_uses_keyset_indexes(self):
+        """Страницы лент по курсору идут по индексам без сортировки."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out, no_color=True)
+        plans = {}
+        plan = []
+        for line in out.getvalue().splitlines()[1:]:
+            if line.startswith('    '):
+                plan.append(line)
+            else:
+                plan = plans[line.strip()] = []
+        for name in ('index', 'group_list', 'profile', 'follow_index'):
+            for page in (name, f'{name} (cursor)'):
+                with self.subTest(page=page):
+                    lines = '\n'.join(plans[page])
+                    self.assertIn('post_', lines)
+                    self.assertNotIn('TEMP B-TREE', lines)
+
+    def test_bench_image_bytes(self):
+        """Замер байтов выводит строку по каждому клиенту."""
+        out = StringIO()
+        call_command('bench_image_bytes', pages=1, stdout=out)
+        rows = {
+            line.split()[0]: line.split()[1:]
+            for line in out.getvalue().splitlines()[2:]
+        }
+        self.assertEqual(
+            set(rows), {'mobile', 'tablet', 'desktop', 'legacy'}
+        )
+        before, after, _ = rows['mobile']
+        self.assertLess(float(after), float(before))
+        self.assertEqual(rows['legacy'][0], rows['legacy'][1])
+
+    def test_backfill_image_metadata(self):
+        """Команда заполняет метаданные картинок в пуле процессов."""
+        posts = Post.objects.exclude(image='')
+        self.assertFalse(posts.filter(image_hash='').exists())
+        expected = dict(posts.values_list('pk', 'image_hash'))
+        for workers in (0, 2):
+            with self.subTest(workers=workers):
+                posts.update(
+                    image_width=None, image_height=None, image_size=None,
+                    image_format='', image_hash='',
+                )
+                call_command(
+                    'backfill_image_metadata', workers=workers,
+                    stdout=StringIO(),
+                )
+                self.assertEqual(
+                    dict(posts.values_list('pk', 'image_hash')), expected
+                )
+                self.assertFalse(posts.filter(image_width=None).exists())
+
+    def test_backfill_updates_by_id(self):
+        """Метаданные обновляются по id постов, а не перебором image."""
+        posts = Post.objects.exclude(image='')
+        posts.update(image_width=None, image_hash='')
+        with mock.patch(
+            'posts.management.commands.backfill_image_metadata'
+            '.UPDATE_CHUNK_SIZE', 2
+        ), CaptureQueriesContext(connection) as queries:
+            call_command(
+                'backfill_image_metadata', workers=0, stdout=StringIO()
+            )
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        per_image = posts.order_by().values('image').annotate(
+            posts=Count('pk')
+        )
+        self.assertEqual(
+            len(updates), sum((row['posts'] + 1) // 2 for row in per_image)
+        )
+        for sql in updates:
+            self.assertNotIn('"image" =', sql)
+        self.assertFalse(posts.filter(image_width=None).exists())
+
+    def test_backfill_image_metadata_errors(self):
+        """Ошибка чтения файла не прерывает команду и не теряет пачку."""
+        posts = Post.objects.exclude(image='')
+        names = sorted(set(posts.values_list('image', flat=True)))
+        broken = names[0]
+        posts.update(
+            image_width=None, image_height=None, image_size=None,
+            image_format='', image_hash=UNREADABLE_HASH,
+        )
+
+        def read(file):
+            if file.name.endswith(broken):
+                raise Image.DecompressionBombError('Слишком большая')
+            return image_metadata(file)
+
+        err = StringIO()
+        with mock.patch(
+            'posts.management.commands.backfill_image_metadata'
+            '.image_metadata', side_effect=read
+        ):
+            call_command(
+                'backfill_image_metadata', workers=0, batch_size=100,
+                stdout=StringIO(), stderr=err,
+            )
+        self.assertIn(broken, err.getvalue())
+        self.assertIn('DecompressionBombError', err.getvalue())
+        self.assertTrue(
+            posts.filter(image=broken, image_hash=UNREADABLE_HASH).exists()
+        )
+        self.assertFalse(
+            posts.exclude(image=broken).filter(image_width=None).exists()
+        )
+
+    def test_backfill_image_metadata_interrupted(self):
+        """При остановке команды прочитанная пачка сохраняется."""
+        posts = Post.objects.exclude(image='')
+        posts.update(image_width=None, image_hash='')
+        read = []
+
+        def read_until_second(file):
+            if read:
+                raise KeyboardInterrupt
+            read.append(file.name)
+            return image_metadata(file)
+
+        with mock.patch(
+            'posts.management.commands.backfill_image_metadata'
+            '.image_metadata', side_effect=read_until_second
+        ), self.assertRaises(KeyboardInterrupt):
+            call_command(
+                'backfill_image_metadata', workers=0, batch_size=100,
+                stdout=StringIO(),
+            )
+        saved = posts.exclude(image_width=None)
+        self.assertTrue(saved.exists())
+        self.assertEqual(set(saved.values_list('image', flat=True)), {
+            name for name in posts.values_list('image', flat=True)
+            if read[0].endswith(name)
+        })
+
+    def test_bench_views(self):
+        """Нагрузочный прогон выводит строку по каждой странице."""
+        out = StringIO()
+        call_command('bench_views', requests=3, stdout=out)
+        for name in (
+            'index', 'group_list', 'profile', 'post_detail', 'follow_index'
+        ):
+            with self.subTest(name=name):
+                self.assertIn(name, out.getvalue())
+
+    def test_bench_views_cache_round_trips(self):
+        """С --cache выводится число походов в общий кэш."""
+        for backend in ('sqlite', 'tiered'):
+            with self.subTest(backend=backend):
+                out = StringIO()
+                call_command(
+                    'bench_views', requests=2, cache=backend, stdout=out
+                )
+                index_row = next(
+                    line for line in out.getvalue().splitlines()
+                    if line.startswith('index')
+                )
+                self.assertNotEqual(index_row.split()[-1], '-')
+
+    def test_bench_views_concurrent_writers(self):
+        """Прогон с процессами-писателями в общий кэш."""
+        out = StringIO()
+        call_command(
+            'bench_views', requests=2, cache='tiered', writers=2,
+            stdout=out,
+        )
+        self.assertIn('follow_index', out.getvalue())
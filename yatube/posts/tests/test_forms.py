@@ -1,11 +1,23 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from ..images import UNREADABLE_HASH
 from ..models import Group, Post
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
 class FormsTest(TestCase):
     """Класс для тестирования форм."""
@@ -78,3 +90,111 @@ class FormsTest(TestCase):
             ).exists()
         )
         self.assertEqual(Post.objects.count(), count_posts)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POSTS_IMAGE_MAX_SIDE=100,
+    POSTS_IMAGE_MAX_PIXELS=1_000_000,
+)
+class ImageUploadTest(TestCase):
+    """Проверка обработки загружаемых картинок."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='ice-king')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @staticmethod
+    def make_jpeg(size):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Test Camera'
+        Image.new('RGB', size, 'blue').save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            'photo.jpeg', buffer.getvalue(), content_type='image/jpeg'
+        )
+
+    def test_image_downscaled_without_metadata(self):
+        """Картинка уменьшается и сохраняется без EXIF."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с фото', 'image': self.make_jpeg((400, 200))},
+        )
+        post = Post.objects.get(text='Пост с фото')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    def test_image_metadata_saved(self):
+        """Размеры, размер файла, формат и хеш картинки сохраняются."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с метаданными', 'image': self.make_jpeg(
+                (400, 200)
+            )},
+        )
+        post = Post.objects.get(text='Пост с метаданными')
+        with open(post.image.path, 'rb') as file:
+            content = file.read()
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        self.assertEqual(post.image_size, len(content))
+        self.assertEqual(post.image_format, 'JPEG')
+        self.assertEqual(
+            post.image_hash, hashlib.sha256(content).hexdigest()
+        )
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_hash, '')
+
+    def test_unreadable_image_not_rehashed(self):
+        """Нечитаемый файл помечается и не перечитывается при сохранении."""
+        post = Post.objects.create(
+            author=self.user, text='Пропавшее фото', image='posts/lost.jpg'
+        )
+        self.assertEqual(post.image_hash, UNREADABLE_HASH)
+        self.assertIsNone(post.image_width)
+        post = Post.objects.get(pk=post.pk)
+        post.text = 'Новый текст'
+        with mock.patch('posts.signals.field_file_metadata') as metadata:
+            post.save()
+        metadata.assert_not_called()
+
+    def test_truncated_image_rejected(self):
+        """Обрезанный файл картинки не принимается и не роняет форму."""
+        upload = self.make_jpeg((400, 200))
+        content = upload.read()
+        truncated = SimpleUploadedFile(
+            'photo.jpeg', content[:len(content) // 2],
+            content_type='image/jpeg',
+        )
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Битое фото', 'image': truncated},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Post.objects.filter(text='Битое фото').exists())
+        self.assertTrue(response.context['form'].has_error('image'))
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка со слишком большим разрешением не принимается."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Огромное фото', 'image': self.make_jpeg(
+                (1001, 1000)
+            )},
+        )
+        self.assertFalse(Post.objects.filter(text='Огромное фото').exists())
+        self.assertTrue(response.context['form'].has_error('image'))
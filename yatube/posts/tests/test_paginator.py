@@ -1,8 +1,13 @@
+from datetime import datetime, timezone
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from ..models import Group, Post
+from ..utils import CURSOR_NEXT, FeedPaginator, encode_cursor
 
 User = get_user_model()
 
@@ -30,6 +35,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_index_firts_page_paginator(self):
@@ -42,6 +48,16 @@ class PaginatorViewsTest(TestCase):
         response = self.guest_client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), POSTS_SECOND_PAGE)
 
+    def test_index_pages_cached_separately(self):
+        """Вторая страница index не отдаёт кэш первой."""
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index') + '?page=2')
+        last_post = Post.objects.order_by('-pub_date', '-pk').first()
+        self.assertNotContains(response, f'{last_post.text}<')
+        self.assertContains(
+            response, reverse('posts:post_detail', args=(last_post.pk - 10,))
+        )
+
     def test_group_list_firts_page_paginator(self):
         """Пажинатор на первой group_list странице работает корректно."""
         response = self.guest_client.get(reverse(
@@ -71,3 +87,176 @@ class PaginatorViewsTest(TestCase):
             + '?page=2'
         )
         self.assertEqual(len(response.context['page_obj']), POSTS_SECOND_PAGE)
+
+    def test_index_cursor_paginator(self):
+        """Курсорный пажинатор проходит index вперёд и назад."""
+        index_url = reverse('posts:index')
+        response = self.guest_client.get(index_url + '?cursor=')
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), POSTS_FIRST_PAGE)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        response = self.guest_client.get(
+            index_url + f'?cursor={first_page.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), POSTS_SECOND_PAGE)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            [post.pk for post in second_page],
+            list(Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )[POSTS_FIRST_PAGE:])
+        )
+        response = self.guest_client.get(
+            index_url + f'?cursor={second_page.previous_cursor}'
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in first_page]
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_past_end(self):
+        """Курсор за последней записью отдаёт пустую страницу без ошибки."""
+        cursor = encode_cursor(CURSOR_NEXT, {
+            'pub_date': datetime(2000, 1, 1, tzinfo=timezone.utc), 'id': 1,
+        })
+        response = self.guest_client.get(
+            reverse('posts:index') + f'?cursor={cursor}'
+        )
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 0)
+        self.assertTrue(page.has_previous())
+        response = self.guest_client.get(
+            reverse('posts:index') + f'?cursor={page.previous_cursor}'
+        )
+        self.assertEqual(len(response.context['page_obj']), POSTS_FIRST_PAGE)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?cursor=not-a-cursor'
+        )
+        self.assertEqual(len(response.context['page_obj']), POSTS_FIRST_PAGE)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class FeedPaginatorTest(TestCase):
+    """Окно страниц и приблизительный подсчёт FeedPaginator."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='window')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}') for i in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window(self):
+        """Ссылки: первая, последняя и окно вокруг текущей страницы."""
+        paginator = FeedPaginator(
+            Post.objects.order_by('pk'), 1, count_limit=100, window=2
+        )
+        ellipsis = FeedPaginator.ELLIPSIS
+        cases = {
+            1: [1, 2, 3, ellipsis, 30],
+            5: [1, 2, 3, 4, 5, 6, 7, ellipsis, 30],
+            15: [1, ellipsis, 13, 14, 15, 16, 17, ellipsis, 30],
+            30: [1, ellipsis, 28, 29, 30],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(paginator.get_page_window(number)), expected
+                )
+
+    def test_short_range_is_not_elided(self):
+        """Немного страниц показываются все."""
+        paginator = FeedPaginator(Post.objects.order_by('pk'), 10)
+        self.assertEqual(paginator.get_page(2).page_window, [1, 2, 3])
+
+    def test_exact_count_below_limit(self):
+        """До лимита число записей считается точно."""
+        paginator = FeedPaginator(
+            Post.objects.order_by('pk'), 10, count_limit=30
+        )
+        self.assertEqual(paginator.count, 30)
+        self.assertFalse(paginator.approximate)
+
+    def test_count_above_limit_is_cached(self):
+        """За лимитом COUNT(*) выполняется один раз и берётся из кэша."""
+        queryset = Post.objects.filter(author=self.user).order_by('pk')
+        paginator = FeedPaginator(queryset, 10, count_limit=5)
+        self.assertEqual(paginator.count, 30)
+        self.assertTrue(paginator.approximate)
+        Post.objects.create(author=self.user, text='Новый пост')
+        with self.assertNumQueries(1):
+            count = FeedPaginator(queryset, 10, count_limit=5).count
+        self.assertEqual(count, 30)
+
+    def test_stale_count_falls_back_to_last_page(self):
+        """Устаревшее число записей не ведёт на пустую страницу."""
+        queryset = Post.objects.filter(author=self.user).order_by('pk')
+        self.assertEqual(
+            FeedPaginator(queryset, 10, count_limit=5).num_pages, 3
+        )
+        Post.objects.filter(
+            pk__in=list(queryset.values_list('pk', flat=True)[:15])
+        ).delete()
+        paginator = FeedPaginator(queryset, 10, count_limit=5)
+        page = paginator.get_page(3)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertFalse(paginator.approximate)
+        self.assertEqual(FeedPaginator(queryset, 10, count_limit=5).count, 15)
+
+    def test_stale_estimate_falls_back_to_last_page(self):
+        """Оценка планировщика до ANALYZE не ведёт на пустую страницу."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.filter(
+            pk__in=list(Post.objects.values_list('pk', flat=True)[:25])
+        ).delete()
+        paginator = FeedPaginator(
+            Post.objects.order_by('pk'), 1, count_limit=2
+        )
+        self.assertEqual(paginator.num_pages, 30)
+        page = paginator.get_page(30)
+        self.assertEqual(page.number, 5)
+        self.assertEqual(list(page), list(Post.objects.order_by('pk')[4:]))
+
+    def test_low_estimate_reaches_real_end(self):
+        """Отставшая от таблицы оценка не прячет старые посты."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Новый пост {i}') for i in range(20)
+        )
+        queryset = Post.objects.order_by('pk')
+        paginator = FeedPaginator(queryset, 10, count_limit=5)
+        self.assertEqual(paginator.num_pages, 3)
+        page = paginator.get_page(5)
+        self.assertEqual(page.number, 5)
+        self.assertEqual(list(page), list(queryset[40:]))
+        self.assertFalse(page.has_next())
+        page = FeedPaginator(queryset, 10, count_limit=5).get_page(3)
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.paginator.num_pages, 5)
+
+    @override_settings(POSTS_EXACT_COUNT_LIMIT=5)
+    def test_index_renders_window(self):
+        """index выводит окно страниц, а не ссылку на каждую."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Ещё пост {i}') for i in range(170)
+        )
+        response = Client().get(reverse('posts:index') + '?page=10')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.num_pages, 20)
+        self.assertContains(response, 'page=20">20<')
+        self.assertNotContains(response, 'page=5">5<')
+        self.assertContains(response, FeedPaginator.ELLIPSIS)
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import FTS_TABLE, SearchResults, match_expression
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    """Проверка полнотекстового поиска постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='bubblegum', is_staff=True, is_superuser=True
+        )
+        cls.rare = Post.objects.create(
+            author=cls.user, text='Кот спит. Собака гуляет.'
+        )
+        cls.frequent = Post.objects.create(
+            author=cls.user, text='Кот, кот и ещё раз кот.'
+        )
+        Post.objects.create(author=cls.user, text='Про собаку.')
+        cls.search_url = reverse('posts:search')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        return [post.pk for post in SearchResults(query)[:10]]
+
+    def test_match_expression(self):
+        """Слова экранируются, последнее ищется по префиксу."""
+        self.assertEqual(
+            match_expression('Кот OR "спит'), '"кот" "or" "спит"*'
+        )
+        self.assertEqual(match_expression(' !! '), '')
+
+    def test_ranked_results(self):
+        """Результаты упорядочены по релевантности."""
+        self.assertEqual(self.search('кот'), [self.frequent.pk, self.rare.pk])
+        self.assertEqual(self.search('кот собака'), [self.rare.pk])
+        self.assertEqual(len(self.search('соба')), 2)
+        self.assertEqual(SearchResults('').count(), 0)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.get(pk=self.rare.pk)
+        post.text = 'Попугай молчит.'
+        post.save()
+        self.assertEqual(self.search('попугай'), [self.rare.pk])
+        self.assertEqual(self.search('кот'), [self.frequent.pk])
+        Post.objects.get(pk=self.frequent.pk).delete()
+        self.assertEqual(self.search('кот'), [])
+
+    def test_search_page(self):
+        """Страница поиска выводит найденные посты постранично."""
+        response = self.guest_client.get(self.search_url, {'q': 'кот'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 2)
+        self.assertEqual(page_obj.object_list[0], self.frequent)
+
+    def test_admin_search(self):
+        """Поиск в админке использует индекс."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'}
+        )
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.rare.pk},
+        )
+
+    def test_rebuild_command(self):
+        """Команда заново заполняет индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertEqual(self.search('кот'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('кот'), [self.frequent.pk, self.rare.pk])
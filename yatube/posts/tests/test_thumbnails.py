@@ -0,0 +1,240 @@
+import shutil
+import tempfile
+import time
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.kvstores.cached_db_kvstore import \
+    KVStore as CachedDBKVStore
+
+from ..cache import GLOBAL_SCOPE, feed_versions, post_scope
+from ..models import Post
+from ..thumbnails import (FAILED_KEY, MISSING_TIMEOUT, THUMBNAIL_ALIASES,
+                          cached_thumbnail, generate_thumbnails,
+                          resolve_thumbnails, resolve_variants, thumbnail_name,
+                          thumbnail_variants, variant_formats, variant_name)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_ASYNC=True)
+class ThumbnailsTest(TestCase):
+    """Проверка заранее созданных миниатюр."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='bmo')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = self.create_post()
+
+    def create_post(self):
+        buffer = BytesIO()
+        Image.new('RGB', (100, 50), 'red').save(buffer, 'JPEG')
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('photo.jpg', buffer.getvalue()),
+        )
+
+    def render(self):
+        return Template(
+            "{% load post_images %}{% thumbnail_url post.image 'card' %}"
+        ).render(Context({'post': self.post}))
+
+    def test_placeholder_while_pending(self):
+        """Пока миниатюры нет, шаблон выводит заглушку."""
+        self.assertIsNone(cached_thumbnail(self.post.image, 'card'))
+        self.assertIn(settings.POSTS_THUMBNAIL_PLACEHOLDER, self.render())
+
+    def test_url_after_generation(self):
+        """После генерации шаблон выводит URL готовой миниатюры."""
+        generate_thumbnails(self.post.image.name)
+        thumbnail = cached_thumbnail(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(thumbnail.size, [960, 339])
+        self.assertEqual(self.render(), thumbnail.url)
+
+    def test_thumbnail_from_other_process(self):
+        """Миниатюра, созданная воркером, видна после MISSING_TIMEOUT."""
+        self.assertIn(settings.POSTS_THUMBNAIL_PLACEHOLDER, self.render())
+        # Воркер пишет в KV-store свой кэш, а не кэш этого процесса.
+        with mock.patch.object(
+            CachedDBKVStore, 'cache', DummyCache('worker', {})
+        ):
+            generate_thumbnails(self.post.image.name)
+        self.assertIn(settings.POSTS_THUMBNAIL_PLACEHOLDER, self.render())
+        later = time.time() + MISSING_TIMEOUT + 1
+        with mock.patch('django.core.cache.backends.locmem.time') as clock:
+            clock.time.return_value = later
+            thumbnail = cached_thumbnail(self.post.image, 'card')
+            self.assertEqual(self.render(), thumbnail.url)
+
+    def test_empty_image(self):
+        """Для поста без картинки шаблон ничего не выводит."""
+        self.post.image = None
+        self.assertEqual(self.render(), '')
+
+    def test_generation_invalidates_feeds(self):
+        """Готовые миниатюры сразу видны в закэшированной ленте."""
+        # Пост уже поставлен в очередь при сохранении: забываем об этом.
+        cache.clear()
+        with mock.patch('posts.thumbnails.enqueue') as enqueue:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, settings.POSTS_THUMBNAIL_PLACEHOLDER)
+        args = enqueue.call_args[0][1]
+        self.assertEqual(args, (self.post.image.name, self.post.pk))
+        etag = response['ETag']
+        version = feed_versions(post_scope(self.post.pk))
+        with CaptureQueriesContext(connection) as queries:
+            generate_thumbnails(*args)
+        # Пост ищется по id, а не перебором таблицы по image.
+        for query in queries:
+            self.assertNotIn('"image" =', query['sql'])
+        self.assertNotEqual(feed_versions(post_scope(self.post.pk)), version)
+        response = self.client.get(
+            reverse('posts:index'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, cached_thumbnail(self.post.image, 'card').url
+        )
+        version = feed_versions(GLOBAL_SCOPE)
+        generate_thumbnails(self.post.image.name, self.post.pk)
+        self.assertEqual(feed_versions(GLOBAL_SCOPE), version)
+
+    def test_prefetch_page_thumbnails(self):
+        """Миниатюры страницы разрешаются одним запросом к KV-store."""
+        posts = [self.post] + [self.create_post() for _ in range(4)]
+        for post in posts:
+            generate_thumbnails(post.image.name)
+        template = Template(
+            "{% load post_images %}"
+            "{% prefetch_thumbnails posts 'card' %}"
+            "{% for post in posts %}"
+            "{% thumbnail_url post.image 'card' %} "
+            "{% endfor %}"
+        )
+        expected = ' '.join(
+            cached_thumbnail(post.image, 'card').url for post in posts
+        ) + ' '
+        cache.clear()
+        with self.assertNumQueries(1):
+            rendered = template.render(Context({'posts': posts}))
+        self.assertEqual(rendered, expected)
+        with self.assertNumQueries(0):
+            template.render(Context({'posts': posts}))
+
+    def test_resolve_pending_thumbnails(self):
+        """Недостающие миниатюры ставятся в очередь, кроме неудачных."""
+        failed = self.create_post()
+        cache.set(FAILED_KEY.format(failed.image.name), True)
+        with override_settings(POSTS_THUMBNAIL_ASYNC=False):
+            urls = resolve_thumbnails([self.post.image, failed.image], 'card')
+        self.assertEqual(urls, {
+            self.post.image.name: None, failed.image.name: None,
+        })
+        self.assertIsNotNone(cached_thumbnail(self.post.image, 'card'))
+        self.assertIsNone(cached_thumbnail(failed.image, 'card'))
+
+    def render_picture(self):
+        return Template(
+            "{% load post_images %}{% picture post.image 'card' 'card-img' %}"
+        ).render(Context({'post': self.post}))
+
+    def test_variants(self):
+        """Варианты идут по ширинам, самый широкий JPEG — сама миниатюра."""
+        variants = thumbnail_variants('card')
+        self.assertEqual(
+            [geometry for image_format, geometry, _ in variants
+             if image_format == 'JPEG'],
+            ['480x170', '720x254', '960x339'],
+        )
+        _, geometry, options = variants[-1]
+        self.assertEqual(
+            variant_name(self.post.image, geometry, options),
+            thumbnail_name(self.post.image, 'card'),
+        )
+
+    @override_settings(POSTS_THUMBNAIL_FORMATS=('AVIF', 'WEBP', 'BMP'))
+    def test_unsupported_formats_skipped(self):
+        """Форматы без поддержки в Pillow или sorl не создаются."""
+        Image.init()
+        formats = variant_formats()
+        self.assertNotIn('BMP', formats)
+        for image_format in formats:
+            self.assertIn(image_format, Image.SAVE)
+
+    def test_picture_markup(self):
+        """Тег picture выводит source по форматам и srcset по ширинам."""
+        generate_thumbnails(self.post.image.name)
+        variants = resolve_variants([self.post.image], 'card')
+        rendered = self.render_picture()
+        self.assertIn('<picture>', rendered)
+        self.assertEqual(
+            rendered.count('<source'), len(variant_formats())
+        )
+        for image_format, thumbnail in variants[self.post.image.name]:
+            with self.subTest(format=image_format, width=thumbnail.width):
+                self.assertIn(f'{thumbnail.url} {thumbnail.width}w', rendered)
+        self.assertIn(
+            f'src="{cached_thumbnail(self.post.image, "card").url}"', rendered
+        )
+        self.assertIn('width="960" height="339"', rendered)
+
+    def test_picture_placeholder(self):
+        """Пока нет ни одного варианта, тег picture выводит заглушку."""
+        rendered = self.render_picture()
+        self.assertNotIn('<picture>', rendered)
+        self.assertIn(settings.POSTS_THUMBNAIL_PLACEHOLDER, rendered)
+        with override_settings(POSTS_THUMBNAIL_ASYNC=False):
+            self.render_picture()
+        self.assertEqual(
+            len(resolve_variants([self.post.image], 'card')
+                [self.post.image.name]),
+            len(thumbnail_variants('card')),
+        )
+
+    def test_picture_with_card_only(self):
+        """Без вариантов выводится готовая миниатюра обычным <img>."""
+        geometry, options = THUMBNAIL_ALIASES['card']
+        card = get_thumbnail(self.post.image.name, geometry, **options)
+        rendered = self.render_picture()
+        self.assertNotIn('<picture>', rendered)
+        self.assertIn(f'src="{card.url}"', rendered)
+        self.assertNotIn(settings.POSTS_THUMBNAIL_PLACEHOLDER, rendered)
+
+    def test_picture_with_some_variants(self):
+        """Выводятся уже созданные варианты, недостающие пропускаются."""
+        variants = thumbnail_variants('card')
+        for _, geometry, options in variants[-2:]:
+            get_thumbnail(self.post.image.name, geometry, **options)
+        rendered = self.render_picture()
+        self.assertIn('<picture>', rendered)
+        self.assertIn('720w', rendered)
+        self.assertIn('960w', rendered)
+        self.assertNotIn('480w', rendered)
+        self.assertIn(
+            f'src="{cached_thumbnail(self.post.image, "card").url}"', rendered
+        )
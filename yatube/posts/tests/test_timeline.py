@@ -0,0 +1,144 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    """Проверка материализованной ленты подписок."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='marceline')
+        cls.author = User.objects.create_user(username='gunter')
+        cls.another_author = User.objects.create_user(username='lsp')
+        for i in range(3):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+        Post.objects.create(author=cls.another_author, text='Чужой пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def timeline_post_ids(self):
+        return set(TimelineEntry.objects.filter(
+            user=self.user
+        ).values_list('post_id', flat=True))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту прошлые посты автора."""
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(
+            self.timeline_post_ids(),
+            set(self.author.posts.values_list('pk', flat=True))
+        )
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertIn(post.pk, self.timeline_post_ids())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_feeds_invalidated_after_fan_out(self):
+        """Версии лент сбрасываются, когда лента подписок уже готова."""
+        Follow.objects.create(user=self.user, author=self.another_author)
+        seen = []
+
+        def bump(*scopes):
+            seen.append(set(self.timeline_post_ids()))
+
+        with mock.patch('posts.signals.bump_feed_versions', side_effect=bump):
+            post = Post.objects.create(author=self.another_author, text='Н')
+            Follow.objects.create(user=self.user, author=self.author)
+        self.assertIn(post.pk, seen[0])
+        self.assertTrue(all(
+            set(Post.objects.filter(author=self.author).values_list(
+                'pk', flat=True
+            )) <= ids for ids in seen[1:]
+        ))
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user, author=self.another_author)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(
+            self.timeline_post_ids(),
+            set(self.another_author.posts.values_list('pk', flat=True))
+        )
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        expected = self.timeline_post_ids()
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_post_ids(), expected)
+
+    def test_rebuild_is_atomic_per_user(self):
+        """Сбой пересборки не оставляет подписчика с пустой лентой."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user, author=self.another_author)
+        expected = self.timeline_post_ids()
+        with mock.patch(
+            'posts.timeline.backfill_timeline',
+            side_effect=[None, RuntimeError('Сбой')],
+        ), self.assertRaises(RuntimeError):
+            call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_post_ids(), expected)
+        Follow.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_follow_cursor_pages(self):
+        """Курсор ленты подписок проходит посты с одной датой по id."""
+        Follow.objects.create(user=self.user, author=self.author)
+        pub_date = self.author.posts.first().pub_date
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}', pub_date=pub_date)
+            for i in range(22)
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        expected = list(
+            self.author.posts.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+        seen = []
+        cursor = ''
+        while True:
+            response = self.authorized_client.get(
+                reverse('posts:follow_index'), {'cursor': cursor}
+            )
+            page = response.context['page_obj']
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    @override_settings(POSTS_FOLLOW_TIMELINE=False)
+    def test_follow_index_without_timeline(self):
+        """Без материализованной ленты follow_index читает подписки."""
+        Follow.objects.create(user=self.user, author=self.another_author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            list(self.another_author.posts.values_list('pk', flat=True))
+        )
@@ -9,8 +9,10 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from ..cache import author_scope, feed_state, group_scope
 from ..forms import PostForm
-from ..models import Comment, Group, Post
+from ..models import Comment, Follow, Group, Post
+from ..views import MAX_COMMENTS
 
 User = get_user_model()
 
@@ -216,6 +218,39 @@ class ViewsTest(TestCase):
         new_post_text = new_response.context['page_obj'].object_list[0].text
         self.assertNotEqual(post_text, new_post_text)
 
+    def test_cache_index_page_invalidated(self):
+        """Кэш index сбрасывается при создании и правке поста."""
+        self.guest_client.get(self.index_url)
+        new_post = Post.objects.create(
+            author=self.user,
+            text='Свежий пост',
+        )
+        response = self.guest_client.get(self.index_url)
+        self.assertContains(response, new_post.text)
+        new_post.text = 'Исправленный пост'
+        new_post.save()
+        response = self.guest_client.get(self.index_url)
+        self.assertContains(response, new_post.text)
+
+    def test_cache_group_list_invalidated_on_group_change(self):
+        """Пост пропадает из кэша старой группы после смены группы."""
+        another_group = Group.objects.create(
+            title='Другая группа',
+            slug='another-slug',
+            description='Другое описание',
+        )
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост для переноса',
+            group=self.group,
+        )
+        response = self.guest_client.get(self.group_list_url)
+        self.assertContains(response, post.text)
+        post.group = another_group
+        post.save()
+        response = self.guest_client.get(self.group_list_url)
+        self.assertNotContains(response, post.text)
+
     def test_follow_index_only_for_authorized_client(self):
         """Проверка, что на страницу подписок попадает
         только авторизованный пользователь.
@@ -247,3 +282,223 @@ class ViewsTest(TestCase):
         response = self.authorized_client.get(self.profile_unfollow_url)
         self.assertEqual(response.status_code, HTTPStatus.FOUND)
         self.assertRedirects(response, self.follow_index_url)
+
+
+class FeedQueriesTest(TestCase):
+    """Проверка количества запросов на страницах лент."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='finn')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(15):
+            author = User.objects.create_user(
+                username=f'author-{i}',
+                first_name=f'Имя {i}',
+                last_name=f'Фамилия {i}',
+            )
+            Post.objects.create(
+                author=author,
+                text=f'Тестовый пост {i}',
+                group=cls.group,
+            )
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Количество запросов на страницу ленты фиксировано."""
+        author = Post.objects.first().author
+        urls_queries = (
+            (self.guest_client, reverse('posts:index'), 2),
+            (self.guest_client, reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ), 3),
+            (self.guest_client, reverse(
+                'posts:profile', kwargs={'username': author.username}
+            ), 3),
+            (self.authorized_client, reverse('posts:follow_index'), 4),
+        )
+        for client, url, queries in urls_queries:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    client.get(url)
+
+
+class PostCommentsTest(TestCase):
+    """Проверка постраничной загрузки комментариев."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='marceline')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        for i in range(MAX_COMMENTS * 2 + 5):
+            author = User.objects.create_user(username=f'commenter-{i}')
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий {i}'
+            )
+        cls.post_detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.post_comments_url = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_post_detail_queries(self):
+        """Первый экран поста не зависит от числа комментариев."""
+        # Проверка свежести, пост с автором, страница комментариев.
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(self.post_detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), MAX_COMMENTS)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.has_next())
+
+    def test_load_more_comments(self):
+        """Эндпоинт отдаёт следующие порции до конца списка."""
+        cursor = self.guest_client.get(
+            self.post_detail_url
+        ).context['comments'].next_cursor
+        texts = []
+        while cursor:
+            with self.assertNumQueries(2):
+                response = self.guest_client.get(
+                    self.post_comments_url, {'cursor': cursor}
+                )
+            self.assertTemplateUsed(response, 'includes/comment_list.html')
+            comments = response.context['comments']
+            texts.extend(comment.text for comment in comments)
+            cursor = comments.next_cursor
+        expected = range(MAX_COMMENTS, MAX_COMMENTS * 2 + 5)
+        self.assertEqual(texts, [f'Комментарий {i}' for i in expected])
+
+    def test_load_more_unknown_post(self):
+        """Для несуществующего поста эндпоинт отвечает 404."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ConditionalGetTest(TestCase):
+    """Проверка ответов 304 на условные запросы."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='lsp')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без запросов к ленте."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(1 if 'posts/' in url else 0):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        """If-Modified-Since после изменения страницы даёт 304."""
+        url = self.urls[0]
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_changes_reset_etag(self):
+        """Новый пост, комментарий или подписка меняют ETag страниц."""
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+        Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        profile_url = self.urls[2]
+        etag = self.guest_client.get(profile_url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.guest_client.get(profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_missing_page_creates_no_state(self):
+        """Несуществующие страницы не заводят версии областей в кэше."""
+        pages = {
+            reverse('posts:group_list', kwargs={'slug': 'missing'}):
+                group_scope('missing'),
+            reverse('posts:profile', kwargs={'username': 'missing'}):
+                author_scope('missing'),
+        }
+        for url, scope in pages.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertNotIn('ETag', response)
+                self.assertIsNone(feed_state(scope, create=False))
+        self.guest_client.get(self.urls[1])
+        self.assertIsNotNone(
+            feed_state(group_scope(self.group.slug), create=False)
+        )
+
+    def test_etag_depends_on_csrf_cookie(self):
+        """После смены CSRF-токена страница с формой не отдаётся 304."""
+        url = self.urls[3]
+        client = Client()
+        client.force_login(self.reader)
+        client.get(url)
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        # Так cookie меняется при повторном входе (rotate_token).
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_etag_depends_on_user(self):
+        """Страница для другого пользователя не считается той же."""
+        url = self.urls[0]
+        etag = self.guest_client.get(url)['ETag']
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
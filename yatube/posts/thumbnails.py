@@ -0,0 +1,277 @@
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import \
+    KVStore as CachedDBKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from tasks.queue import enqueue, task
+
+from .cache import bump_feed_versions, post_feed_scopes, post_scope
+from .images import CONTENT_TYPES
+from .models import Post
+
+# Миниатюры, которые выводят шаблоны: алиас -> (геометрия, опции sorl).
+THUMBNAIL_ALIASES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Атрибут sizes для srcset: ширина миниатюры на странице.
+THUMBNAIL_SIZES = {
+    'card': '(min-width: 992px) 960px, 100vw',
+}
+
+# Запасной формат вариантов, его понимает любой браузер.
+FALLBACK_FORMAT = 'JPEG'
+
+SOURCE_TYPES = dict(CONTENT_TYPES, AVIF='image/avif')
+
+FAILED_KEY = 'thumbnail_failed:{}'
+QUEUED_KEY = 'thumbnail_queued:{}'
+# Пока ключ жив, повторная постановка в очередь не доходит до базы.
+QUEUED_TIMEOUT = 60 * 5
+# Сколько секунд помнить, что миниатюры нет. sorl кэширует промах
+# на THUMBNAIL_CACHE_TIMEOUT, и миниатюру, созданную воркером,
+# процесс с локальным кэшем не увидел бы никогда.
+MISSING_TIMEOUT = 10
+
+
+def variant_formats():
+    """Современные форматы из POSTS_THUMBNAIL_FORMATS, которые можно создать.
+
+    Формат нужен и в сборке Pillow, и в расширениях файлов sorl.
+    """
+    Image.init()
+    return tuple(
+        image_format for image_format in settings.POSTS_THUMBNAIL_FORMATS
+        if image_format in Image.SAVE and image_format in EXTENSIONS
+    )
+
+
+def thumbnail_variants(alias):
+    """Варианты миниатюры для srcset: [(формат, геометрия, опции sorl)].
+
+    Ширины берутся из POSTS_THUMBNAIL_WIDTHS, но не больше ширины
+    алиаса, высота сохраняет его пропорции. Самый широкий вариант
+    в запасном формате совпадает с файлом самой миниатюры.
+    """
+    geometry, options = THUMBNAIL_ALIASES[alias]
+    width, height = (int(side) for side in geometry.split('x'))
+    widths = sorted(
+        {min(variant, width) for variant in settings.POSTS_THUMBNAIL_WIDTHS}
+        | {width}
+    )
+    return [
+        (
+            image_format,
+            f'{variant}x{round(height * variant / width)}',
+            dict(options, format=image_format),
+        )
+        for image_format in variant_formats() + (FALLBACK_FORMAT,)
+        for variant in widths
+    ]
+
+
+def thumbnail_name(image, alias):
+    """Имя файла миниатюры, как его вычисляет sorl, без генерации."""
+    geometry, options = THUMBNAIL_ALIASES[alias]
+    return variant_name(image, geometry, options)
+
+
+def variant_name(image, geometry, options):
+    """Имя файла миниатюры с геометрией и опциями sorl.
+
+    Повторяет подготовку опций из ThumbnailBackend.get_thumbnail,
+    чтобы имя совпало с тем, под которым миниатюра лежит в KV-store.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def cached_thumbnail(image, alias):
+    """Готовая миниатюра из KV-store sorl или None, если её ещё нет."""
+    geometry, options = THUMBNAIL_ALIASES[alias]
+    return cached_variant(image, geometry, options)
+
+
+def cached_variant(image, geometry, options):
+    key = add_prefix(ImageFile(
+        variant_name(image, geometry, options), default.storage
+    ).key)
+    value = kvstore_values([key]).get(key)
+    return deserialize_image_file(value) if value else None
+
+
+def kvstore_values(raw_keys):
+    """Значения KV-store sorl по ключам с префиксами.
+
+    Для KV-store на кэше и базе — один get_many к кэшу и один запрос
+    к таблице thumbnail_kvstore на все промахи. Отсутствующие ключи
+    кэшируются как пустые лишь на MISSING_TIMEOUT секунд.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {key: kvstore._get_raw(key) for key in raw_keys}
+    values = kvstore.cache.get_many(raw_keys)
+    missing = [key for key in raw_keys if key not in values]
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        kvstore.cache.set_many(
+            found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        kvstore.cache.set_many(
+            {key: EMPTY_VALUE for key in missing if key not in found},
+            MISSING_TIMEOUT,
+        )
+        values.update(found)
+    return {
+        key: None if value == EMPTY_VALUE else value
+        for key, value in values.items()
+    }
+
+
+def resolve_files(images, specs):
+    """Готовые миниатюры пачки картинок: {имя картинки: [ImageFile]}.
+
+    images — картинки постов (ImageFieldFile), specs — список
+    (геометрия, опции sorl); на месте ещё не созданной миниатюры
+    стоит None. Файлы миниатюр не проверяются. Создание недостающих
+    ставится в очередь, кроме картинок, для которых оно не удалось.
+    """
+    post_ids = {image.name: image.instance.pk for image in images if image}
+    keys = {
+        (name, index): add_prefix(ImageFile(
+            variant_name(name, geometry, options), default.storage
+        ).key)
+        for name in post_ids
+        for index, (geometry, options) in enumerate(specs)
+    }
+    values = kvstore_values(list(set(keys.values())))
+    files = {}
+    for (name, index), key in sorted(keys.items()):
+        value = values.get(key)
+        files.setdefault(name, []).append(
+            deserialize_image_file(value) if value else None
+        )
+    pending = [name for name, found in files.items() if None in found]
+    if pending:
+        failed = cache.get_many(FAILED_KEY.format(name) for name in pending)
+        for name in pending:
+            if FAILED_KEY.format(name) not in failed:
+                schedule_thumbnails(name, post_ids[name])
+    return files
+
+
+def resolve_thumbnails(images, alias):
+    """URL готовых миниатюр пачки картинок: {имя картинки: URL или None}."""
+    files = resolve_files(images, [THUMBNAIL_ALIASES[alias]])
+    return {
+        name: thumbnail.url if thumbnail else None
+        for name, (thumbnail,) in files.items()
+    }
+
+
+def resolve_variants(images, alias):
+    """Готовые варианты миниатюр пачки картинок для srcset.
+
+    {имя картинки: [(формат, ImageFile)]} — только уже созданные
+    варианты, недостающие ставятся в очередь. Размеры вариантов
+    берутся из KV-store, файлы не открываются.
+    """
+    variants = thumbnail_variants(alias)
+    files = resolve_files(
+        images,
+        [(geometry, options) for _, geometry, options in variants],
+    )
+    return {
+        name: [
+            (image_format, thumbnail)
+            for (image_format, _, _), thumbnail in zip(variants, found)
+            if thumbnail is not None
+        ]
+        for name, found in files.items()
+    }
+
+
+@task(priority=5)
+def generate_thumbnails(image_name, post_id=None):
+    """Создаёт недостающие миниатюры и варианты, которые выводят шаблоны.
+
+    Если что-то создано, сбрасывается кэш лент поста post_id.
+    """
+    specs = [
+        (geometry, options)
+        for alias in THUMBNAIL_ALIASES
+        for _, geometry, options in thumbnail_variants(alias)
+    ]
+    missing = [
+        (geometry, options) for geometry, options in specs
+        if cached_variant(image_name, geometry, options) is None
+    ]
+    for geometry, options in missing:
+        get_thumbnail(image_name, geometry, **options)
+    created = [
+        (geometry, options) for geometry, options in missing
+        if cached_variant(image_name, geometry, options) is not None
+    ]
+    if created and post_id is not None:
+        invalidate_post_feeds(post_id)
+    if len(created) < len(missing):
+        # Битый или отсутствующий исходник: не пытаемся снова
+        # на каждом рендере страницы.
+        cache.set(
+            FAILED_KEY.format(image_name), True,
+            settings.POSTS_THUMBNAIL_RETRY_TIMEOUT
+        )
+
+
+def invalidate_post_feeds(post_id):
+    """Сбрасывает кэш лент и страницы поста с новыми миниатюрами.
+
+    Иначе закэшированные фрагменты и ETag страниц продолжают
+    отдавать заглушку. Пост ищется по id: по image нет индекса.
+    """
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if post is None:
+        return
+    bump_feed_versions(*post_feed_scopes(*post), post_scope(post_id))
+
+
+def thumbnail_failed(image_name):
+    return cache.get(FAILED_KEY.format(image_name), False)
+
+
+def schedule_thumbnails(image_name, post_id):
+    """Ставит создание миниатюр картинки поста post_id в очередь задач."""
+    if not image_name:
+        return
+    if not settings.POSTS_THUMBNAIL_ASYNC:
+        generate_thumbnails(image_name, post_id)
+        return
+    if cache.add(QUEUED_KEY.format(image_name), True, QUEUED_TIMEOUT):
+        enqueue(
+            generate_thumbnails, (image_name, post_id),
+            dedup_key=f'thumbnails:{image_name}',
+        )
@@ -0,0 +1,70 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, Post, TimelineEntry
+
+
+def _insert_entries(entries):
+    """Вставляет записи ленты пачками, не собирая их все в память."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert_entries(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту подписчика все посты автора."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _insert_entries(
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def prune_timeline(user_id, author_id):
+    """Убирает из ленты подписчика посты автора."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild_timelines(user_ids=None):
+    """Пересобирает ленты подписок с нуля.
+
+    Лента каждого подписчика пересобирается в своей транзакции:
+    читатели видят старую ленту, пока не готова новая.
+    Возвращает количество обработанных подписок.
+    """
+    if user_ids is None:
+        user_ids = Follow.objects.order_by().values_list(
+            'user_id', flat=True
+        ).union(
+            TimelineEntry.objects.order_by().values_list('user_id', flat=True)
+        )
+    count = 0
+    for user_id in user_ids:
+        with transaction.atomic():
+            TimelineEntry.objects.filter(user_id=user_id).delete()
+            for author_id in Follow.objects.filter(
+                user_id=user_id
+            ).values_list('author_id', flat=True):
+                backfill_timeline(user_id, author_id)
+                count += 1
+    return count
@@ -1,9 +1,380 @@
+import base64
+import binascii
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .cache import CachedQuery
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+def encode_cursor(direction, obj):
+    """Упаковывает позицию (pub_date, id) в непрозрачный токен.
+
+    obj — экземпляр модели или строка values() с ключами pub_date и id.
+    """
+    if isinstance(obj, dict):
+        pub_date, pk = obj['pub_date'], obj['id']
+    else:
+        pub_date, pk = obj.pub_date, obj.pk
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора.
+
+    Возвращает кортеж (direction, pub_date, pk) или None,
+    если токен пустой или повреждён.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage:
+    """Страница курсорного пагинатора.
+
+    Повторяет ту часть интерфейса django.core.paginator.Page,
+    которой пользуются шаблоны: итерацию, len и has_* методы.
+    position — позиция (pub_date, id) из курсора: от неё строятся
+    курсоры соседних страниц, если страница пустая.
+    """
+
+    def __init__(self, object_list, cursor, has_next, has_previous,
+                 position=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.position = position
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _edge(self, index):
+        if self.object_list:
+            return self.object_list[index]
+        if self.position is None:
+            return None
+        pub_date, pk = self.position
+        return {'pub_date': pub_date, 'id': pk}
+
+    @property
+    def next_cursor(self):
+        edge = self._edge(-1)
+        if not self.has_next() or edge is None:
+            return None
+        return encode_cursor(CURSOR_NEXT, edge)
+
+    @property
+    def previous_cursor(self):
+        edge = self._edge(0)
+        if not self.has_previous() or edge is None:
+            return None
+        return encode_cursor(CURSOR_PREVIOUS, edge)
+
+
+class CursorPaginator:
+    """Курсорный (keyset) пагинатор по паре (pub_date, id).
+
+    Вместо COUNT(*) и OFFSET страница выбирается условием
+    по позиции последней показанной записи, поэтому стоимость
+    запроса не зависит от глубины страницы. keys — поля queryset,
+    по которым идут условие и порядок; их значения должны совпадать
+    с pub_date и id записи.
+    """
+
+    def __init__(self, object_list, per_page, descending=True,
+                 keys=('pub_date', 'pk')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.descending = descending
+        self.date_key, self.id_key = keys
+
+    def _ordering(self, reverse=False):
+        if self.descending != reverse:
+            return (f'-{self.date_key}', f'-{self.id_key}')
+        return (self.date_key, self.id_key)
+
+    def _after(self, pub_date, pk, reverse=False):
+        """Условие «запись идёт после позиции» в порядке выдачи.
+
+        Внешнее условие — диапазон по pub_date, который планировщик
+        берёт из индекса (…, -pub_date, -id); OR лишь уточняет
+        записи с той же датой.
+        """
+        date, key = self.date_key, self.id_key
+        if self.descending != reverse:
+            return Q(**{f'{date}__lte': pub_date}) & (
+                Q(**{f'{date}__lt': pub_date}) | Q(**{f'{key}__lt': pk})
+            )
+        return Q(**{f'{date}__gte': pub_date}) & (
+            Q(**{f'{date}__gt': pub_date}) | Q(**{f'{key}__gt': pk})
+        )
+
+    def page_queryset(self, position=None, reverse=False):
+        """Запрос страницы: per_page + 1 записей после позиции.
+
+        position — (pub_date, id) из курсора или None для первой
+        страницы. Лишняя запись показывает, есть ли следующая.
+        """
+        queryset = self.object_list
+        if position is not None:
+            queryset = queryset.filter(self._after(*position, reverse))
+        return queryset.order_by(*self._ordering(reverse))[:self.per_page + 1]
+
+    def get_page(self, cursor):
+        """Возвращает страницу по токену; битый токен — первая страница."""
+        position = decode_cursor(cursor)
+        if position is None:
+            objects = list(self.page_queryset())
+            has_next = len(objects) > self.per_page
+            return CursorPage(objects[:self.per_page], '', has_next, False)
+        direction, pub_date, pk = position
+        reverse = direction == CURSOR_PREVIOUS
+        objects = list(self.page_queryset((pub_date, pk), reverse))
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if reverse:
+            objects.reverse()
+            return CursorPage(
+                objects, cursor, True, has_more, (pub_date, pk)
+            )
+        return CursorPage(objects, cursor, has_more, True, (pub_date, pk))
+
+
+def estimate_rows(model, using='default'):
+    """Число строк таблицы по статистике планировщика без COUNT(*).
+
+    На SQLite статистика появляется после ANALYZE. Возвращает None,
+    если оценки нет.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(sql, [table])
+        except DatabaseError:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без точного COUNT(*) по большим таблицам.
+
+    Для нефильтрованного queryset число строк берётся из статистики
+    планировщика, для отфильтрованного — считается, но не дальше
+    count_limit строк.
+    """
+
+    def __init__(self, *args, count_limit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if count_limit is None:
+            count_limit = settings.POSTS_ADMIN_COUNT_LIMIT
+        self.count_limit = count_limit
+
+    def estimate_count(self, queryset):
+        """Оценка планировщика для нефильтрованного queryset или None."""
+        if queryset.query.where:
+            return None
+        return estimate_rows(queryset.model, queryset.db)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = self.estimate_count(queryset)
+        if estimate is not None:
+            return estimate
+        return queryset[:self.count_limit].count()
+
+
+class FeedPaginator(EstimatedCountPaginator):
+    """Нумерованный пагинатор лент, стоимость которого не растёт с таблицей.
+
+    Число записей до POSTS_EXACT_COUNT_LIMIT считается точно запросом
+    с LIMIT. Дальше берётся оценка планировщика (нефильтрованная лента)
+    или точный COUNT(*); результат кэшируется на
+    POSTS_COUNT_CACHE_TIMEOUT. Приблизительное число устаревает в обе
+    стороны: если страница оказалась пустой или за последней страницей
+    есть запись, записи пересчитываются точно.
+    Ссылки на страницы — окно вокруг текущей плюс первая и последняя.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, *args, count_limit=None, window=None, **kwargs):
+        if count_limit is None:
+            count_limit = settings.POSTS_EXACT_COUNT_LIMIT
+        super().__init__(*args, count_limit=count_limit, **kwargs)
+        if window is None:
+            window = settings.POSTS_PAGE_WINDOW
+        self.window = window
+        self.approximate = False
+
+    def count_cache_key(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+        return f'posts:count:{digest}'
+
+    @cached_property
+    def count(self):
+        object_list = self.object_list
+        if isinstance(object_list, CachedQuery):
+            count, self.approximate = object_list.cached(
+                'count', lambda: (
+                    self.count_queryset(object_list.queryset),
+                    self.approximate,
+                )
+            )
+            return count
+        if isinstance(object_list, QuerySet):
+            return self.count_queryset(object_list)
+        return len(object_list)
+
+    def count_queryset(self, queryset):
+        """Число записей queryset с ограничением на точный подсчёт."""
+        bounded = queryset[:self.count_limit + 1].count()
+        if bounded <= self.count_limit:
+            return bounded
+        self.approximate = True
+
+        def total():
+            estimate = self.estimate_count(queryset)
+            if estimate is None:
+                return queryset.count()
+            return max(estimate, bounded)
+
+        return cache.get_or_set(
+            self.count_cache_key(queryset), total,
+            settings.POSTS_COUNT_CACHE_TIMEOUT,
+        )
+
+    def recount(self):
+        """Точно пересчитывает записи и обновляет закэшированное число."""
+        object_list = self.object_list
+        queryset = getattr(object_list, 'queryset', object_list)
+        count = queryset.count()
+        cache.set(
+            self.count_cache_key(queryset), count,
+            settings.POSTS_COUNT_CACHE_TIMEOUT,
+        )
+        if isinstance(object_list, CachedQuery):
+            object_list.forget('count')
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        self.approximate = False
+
+    def get_page_window(self, number, on_ends=1):
+        """Номера страниц для ссылок: края и окно вокруг number.
+
+        Пропуски обозначаются ELLIPSIS.
+        """
+        num_pages = self.num_pages
+        if num_pages <= (self.window + on_ends) * 2 + 1:
+            yield from self.page_range
+            return
+        start = max(number - self.window, 1)
+        end = min(number + self.window, num_pages)
+        if start > on_ends + 2:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+        else:
+            start = 1
+        if end < num_pages - on_ends - 1:
+            yield from range(start, end + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(start, num_pages + 1)
+
+    def is_stale(self, page):
+        """Приблизительное число записей расходится со страницей."""
+        if page.number > 1 and not len(page):
+            return True
+        if page.number < self.num_pages:
+            return False
+        # Оценка отстаёт от растущей таблицы: ищем запись за концом.
+        queryset = getattr(self.object_list, 'queryset', self.object_list)
+        return queryset[self.count:self.count + 1].exists()
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        if self.approximate and self.is_stale(page):
+            self.recount()
+            page = super().get_page(number)
+        page.page_window = list(self.get_page_window(page.number))
+        return page
+
 
+def make_paginator(request, posts, max_posts, cursor=None, scopes=None,
+                   keys=('pub_date', 'pk')):
+    """Util-функция для создания пагинатора.
 
-def make_paginator(request, posts, max_posts):
-    """Util-функция для создания пагинатора."""
-    paginator = Paginator(posts, max_posts)
+    По умолчанию страницы нумерованные (?page=). Курсорный режим
+    (?cursor=) включается аргументом cursor, настройкой
+    POSTS_CURSOR_PAGINATION или наличием cursor в запросе; keys —
+    поля курсора, см. CursorPaginator.
+    С scopes число записей и id нумерованных страниц кэшируются
+    до изменения этих областей (POSTS_QUERY_CACHE).
+    """
+    if cursor is None:
+        cursor = (
+            getattr(settings, 'POSTS_CURSOR_PAGINATION', False)
+            or 'cursor' in request.GET
+        )
+    if cursor:
+        paginator = CursorPaginator(posts, max_posts, keys=keys)
+        return paginator.get_page(request.GET.get('cursor'))
+    if scopes and settings.POSTS_QUERY_CACHE:
+        posts = CachedQuery(posts, scopes)
+    paginator = FeedPaginator(posts, max_posts)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
@@ -1,41 +1,92 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 
+from .cache import (GLOBAL_SCOPE, author_scope, feed_cache_context,
+                    group_scope, post_scope)
+from .conditional import conditional_page
+from .counters import author_stats
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import make_paginator
+from .models import (FOLLOW_CURSOR_KEYS, Comment, Follow, Group, Post,
+                     User)
+from .search import SearchResults
+from .utils import CursorPaginator, make_paginator
 
 MAX_POSTS = 10
+MAX_COMMENTS = 20
 
 
+def comments_page(post_id, cursor=None):
+    """Страница комментариев поста вместе с авторами, от старых к новым."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only(
+        'id', 'text', 'pub_date', 'post_id',
+        'author__id', 'author__username',
+        'author__first_name', 'author__last_name',
+    )
+    paginator = CursorPaginator(comments, MAX_COMMENTS, descending=False)
+    return paginator.get_page(cursor)
+
+
+def post_page_scopes(post_id):
+    """Области страницы поста; None, если поста нет."""
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if post is None:
+        return None
+    username, slug = post
+    scopes = [post_scope(post_id), author_scope(username)]
+    if slug:
+        scopes.append(group_scope(slug))
+    return scopes
+
+
+@conditional_page(lambda: (GLOBAL_SCOPE,))
 def index(request):
     """View-функция для рендера главной страницы."""
     template = 'posts/index.html'
-    posts = Post.objects.all()
-    page_obj = make_paginator(request, posts, MAX_POSTS)
-    return render(request, template, context={'page_obj': page_obj})
+    posts = Post.objects.feed()
+    page_obj = make_paginator(
+        request, posts, MAX_POSTS, scopes=(GLOBAL_SCOPE,)
+    )
+    context = {
+        'page_obj': page_obj,
+        **feed_cache_context(GLOBAL_SCOPE),
+    }
+    return render(request, template, context)
 
 
+@conditional_page(lambda slug: (group_scope(slug),))
 def group_posts(request, slug):
     """View-функция для рендера постов в конкртеной группе."""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = make_paginator(request, posts, MAX_POSTS)
+    posts = group.posts.feed()
+    page_obj = make_paginator(
+        request, posts, MAX_POSTS, scopes=(group_scope(group.slug),)
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        **feed_cache_context(group_scope(group.slug)),
     }
     return render(request, template, context)
 
 
+@conditional_page(lambda username: (author_scope(username),))
 def profile(request, username):
     """View-функция для рендера профайла пользователя."""
     temmplate = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    count_posts = posts.count()
-    page_obj = make_paginator(request, posts, MAX_POSTS)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    stats = author_stats(author)
+    posts = author.posts.feed()
+    page_obj = make_paginator(
+        request, posts, MAX_POSTS, scopes=(author_scope(author.username),)
+    )
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -44,22 +95,26 @@ def profile(request, username):
         ).exists()
     context = {
         'author': author,
-        'count_posts': count_posts,
+        'count_posts': stats.post_count,
+        'count_followers': stats.follower_count,
+        'count_following': stats.following_count,
         'page_obj': page_obj,
         'following': following,
+        **feed_cache_context(author_scope(author.username)),
     }
     return render(request, temmplate, context)
 
 
+@conditional_page(post_page_scopes)
 def post_detail(request, post_id):
     """View-функция для рендера страницы поста."""
     temmplate = 'posts/post_detail.html'
     selected_post = get_object_or_404(
-        Post.objects.select_related('group', 'author',),
+        Post.objects.select_related('group', 'author', 'author__stats'),
         pk=post_id
     )
-    count_posts = selected_post.author.posts.count()
-    comments = selected_post.comments.all()
+    count_posts = author_stats(selected_post.author).post_count
+    comments = comments_page(selected_post.pk)
     form = CommentForm()
     context = {
         'count_posts': count_posts,
@@ -70,6 +125,31 @@ def post_detail(request, post_id):
     return render(request, temmplate, context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста фрагментом HTML."""
+    template = 'includes/comment_list.html'
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(post_id, request.GET.get('cursor')),
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    """View-функция для поиска постов по тексту."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = make_paginator(
+        request, SearchResults(query), MAX_POSTS, cursor=False
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
 def post_create(request):
     """View-функция для рендера страницы создания поста."""
@@ -129,8 +209,13 @@ def follow_index(request):
     на которых user подписан.
     """
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = make_paginator(request, posts, MAX_POSTS)
+    posts = Post.objects.feed().followed_by(request.user)
+    # Подписки подписчика меняют его область автора, посты — общую.
+    page_obj = make_paginator(
+        request, posts, MAX_POSTS,
+        scopes=(GLOBAL_SCOPE, author_scope(request.user.username)),
+        keys=FOLLOW_CURSOR_KEYS,
+    )
     return render(request, template, context={'page_obj': page_obj})
 
 
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class TasksConfig(AppConfig):
+    """Конфиг приложения tasks."""
+
+    name = 'tasks'
+    verbose_name = 'Фоновые задачи'
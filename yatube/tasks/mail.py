@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .queue import enqueue, task
+
+
+def message_data(message):
+    """Поля письма, которые можно сохранить в JSON."""
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': [
+            list(alternative)
+            for alternative in getattr(message, 'alternatives', ())
+        ],
+    }
+
+
+@task(priority=10, max_attempts=5)
+def send_email(data):
+    """Отправляет письмо бэкендом TASKS_EMAIL_BACKEND."""
+    message = EmailMultiAlternatives(**data)
+    connection = get_connection(settings.TASKS_EMAIL_BACKEND)
+    connection.send_messages([message])
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Ставит письма в очередь задач вместо отправки во время запроса.
+
+    Вложения не поддерживаются: письма проекта их не содержат.
+    """
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            enqueue(send_email, (message_data(message),))
+        return len(email_messages)
@@ -0,0 +1,120 @@
+import logging
+import os
+import socket
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from tasks.queue import claim_tasks, purge_finished, requeue_stale, run_task
+
+logger = logging.getLogger(__name__)
+
+
+def run_in_worker(pk):
+    """Выполняет задачу в потоке или процессе пула."""
+    try:
+        return run_task(pk)
+    finally:
+        close_old_connections()
+
+
+def log_failures(futures):
+    """Логирует ошибки, случившиеся в пуле вне run_task."""
+    for future, pk in futures.items():
+        error = future.exception()
+        if error is not None:
+            logger.error(
+                'Воркер не выполнил задачу #%s', pk,
+                exc_info=(type(error), error, error.__traceback__),
+            )
+
+
+class Command(BaseCommand):
+    """Воркер очереди фоновых задач."""
+
+    help = (
+        'Забирает задачи из очереди и выполняет их в пуле потоков '
+        'или процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASKS_WORKERS,
+            help='Размер пула.',
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо пула потоков.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.TASKS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, секунд.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи в текущем процессе и выйти.',
+        )
+
+    def drain(self, worker):
+        done = 0
+        while True:
+            claimed = claim_tasks(1, worker)
+            if not claimed:
+                return done
+            run_task(claimed[0])
+            done += 1
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        requeue_stale()
+        if options['once']:
+            done = self.drain(worker)
+            self.stdout.write(f'Выполнено задач: {done}')
+            return
+        if options['processes']:
+            # Дочерние процессы не должны делить подключения с родителем.
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                options['workers'], initializer=django.setup
+            )
+        else:
+            pool = ThreadPoolExecutor(
+                options['workers'], thread_name_prefix='tasks'
+            )
+        self.stdout.write(f'Воркер {worker} запущен')
+        running = {}
+        last_cleanup = time.monotonic()
+        try:
+            while True:
+                free = options['workers'] - len(running)
+                claimed = claim_tasks(free, worker) if free > 0 else []
+                running.update(
+                    (pool.submit(run_in_worker, pk), pk) for pk in claimed
+                )
+                if time.monotonic() - last_cleanup > 60:
+                    requeue_stale()
+                    purge_finished()
+                    last_cleanup = time.monotonic()
+                if claimed and len(running) < options['workers']:
+                    continue
+                if running:
+                    finished, _ = wait(
+                        running,
+                        timeout=options['poll_interval'],
+                        return_when=FIRST_COMPLETED,
+                    )
+                    log_failures(
+                        {future: running.pop(future) for future in finished}
+                    )
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка: ждём выполняющиеся задачи')
+        finally:
+            pool.shutdown(wait=True)
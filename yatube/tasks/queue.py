@@ -0,0 +1,180 @@
+import json
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+STALE_ERROR = 'Воркер не завершил задачу за TASKS_LOCK_TIMEOUT'
+
+
+def task(func=None, *, priority=0, max_attempts=3):
+    """Декоратор фоновой задачи.
+
+    Функция остаётся обычной функцией и получает метод
+    enqueue(*args, **kwargs), который ставит её вызов в очередь
+    с параметрами по умолчанию. Аргументы должны сериализоваться в JSON.
+    """
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+        func.task_options = {
+            'priority': priority,
+            'max_attempts': max_attempts,
+        }
+        func.enqueue = lambda *args, **kwargs: enqueue(func, args, kwargs)
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def enqueue(func, args=(), kwargs=None, *, priority=None, max_attempts=None,
+            dedup_key=None, delay=0):
+    """Ставит вызов функции-задачи в очередь.
+
+    Запись создаётся в текущей транзакции: если она откатится,
+    задачи не будет. Если в очереди уже есть задача с тем же
+    dedup_key, новая не создаётся и возвращается существующая.
+    При TASKS_EAGER задача выполняется сразу и возвращается None.
+    """
+    kwargs = kwargs or {}
+    if settings.TASKS_EAGER:
+        func(*args, **kwargs)
+        return None
+    options = func.task_options
+    new_task = Task(
+        name=func.task_name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs}),
+        priority=options['priority'] if priority is None else priority,
+        max_attempts=(
+            options['max_attempts'] if max_attempts is None else max_attempts
+        ),
+        dedup_key=dedup_key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if dedup_key is None:
+        new_task.save()
+        return new_task
+    try:
+        with transaction.atomic():
+            new_task.save()
+    except IntegrityError:
+        return Task.objects.filter(
+            dedup_key=dedup_key, status=Task.QUEUED
+        ).first()
+    return new_task
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором со случайным разбросом."""
+    delay = min(
+        settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASKS_RETRY_MAX_DELAY,
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim_tasks(limit, worker):
+    """Забирает до limit готовых задач, возвращает их id.
+
+    Задача переводится в running условным UPDATE, поэтому её не заберут
+    два воркера одновременно и без SELECT ... FOR UPDATE.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by('-priority', 'run_at', 'pk').values_list('pk', flat=True)
+    claimed = []
+    for pk in candidates[:limit]:
+        updated = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(pk)
+    return claimed
+
+
+def _requeue(pk, **fields):
+    """Возвращает задачу в очередь; False, если там уже есть дубль."""
+    try:
+        with transaction.atomic():
+            Task.objects.filter(pk=pk).update(
+                status=Task.QUEUED, locked_by='', locked_at=None, **fields
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def run_task(pk):
+    """Выполняет задачу, взятую claim_tasks, и записывает результат."""
+    current = Task.objects.get(pk=pk)
+    try:
+        func = import_string(current.name)
+        payload = json.loads(current.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s #%s упала', current.name, pk)
+        if current.attempts < current.max_attempts and _requeue(
+            pk,
+            last_error=error,
+            run_at=timezone.now() + timedelta(
+                seconds=retry_delay(current.attempts)
+            ),
+        ):
+            return Task.QUEUED
+        # Попытки кончились или в очереди уже ждёт такая же задача.
+        Task.objects.filter(pk=pk).update(
+            status=Task.FAILED, last_error=error, finished=timezone.now()
+        )
+        return Task.FAILED
+    Task.objects.filter(pk=pk).update(
+        status=Task.DONE, finished=timezone.now()
+    )
+    return Task.DONE
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи упавших воркеров.
+
+    Задача, исчерпавшая попытки, помечается ошибкой: иначе задача,
+    которая роняет воркер, возвращалась бы в очередь бесконечно.
+    """
+    expired = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    stale = Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=expired
+    ).values_list('pk', 'attempts', 'max_attempts')
+    count = 0
+    for pk, attempts, max_attempts in stale:
+        if attempts >= max_attempts or not _requeue(pk):
+            Task.objects.filter(pk=pk).update(
+                status=Task.FAILED,
+                last_error=STALE_ERROR,
+                finished=timezone.now(),
+            )
+        count += 1
+    return count
+
+
+def purge_finished():
+    """Удаляет выполненные задачи старше TASKS_KEEP_FINISHED секунд."""
+    expired = timezone.now() - timedelta(
+        seconds=settings.TASKS_KEEP_FINISHED
+    )
+    deleted, _ = Task.objects.filter(
+        status=Task.DONE, finished__lt=expired
+    ).delete()
+    return deleted
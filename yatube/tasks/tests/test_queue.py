@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..management.commands.run_worker import log_failures
+from ..models import Task
+from ..queue import (claim_tasks, enqueue, requeue_stale, run_task,
+                     task)
+
+CALLS = []
+
+
+@task
+def record(value):
+    CALLS.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('Ошибка задачи')
+
+
+class QueueTest(TestCase):
+    """Класс для тестирования очереди задач."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_and_run(self):
+        """Задача из очереди выполняется воркером."""
+        record.enqueue(1)
+        call_command('run_worker', once=True, stdout=StringIO())
+        self.assertEqual(CALLS, [1])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_priority(self):
+        """Задачи с большим приоритетом забираются первыми."""
+        low = enqueue(record, ('low',))
+        high = enqueue(record, ('high',), priority=10)
+        self.assertEqual(claim_tasks(2, 'test'), [high.pk, low.pk])
+        self.assertEqual(claim_tasks(2, 'test'), [])
+
+    def test_dedup_key(self):
+        """Вторая задача с тем же ключом не ставится, пока первая ждёт."""
+        first = enqueue(record, (1,), dedup_key='same')
+        self.assertEqual(enqueue(record, (2,), dedup_key='same'), first)
+        self.assertEqual(Task.objects.count(), 1)
+        claim_tasks(1, 'test')
+        enqueue(record, (3,), dedup_key='same')
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется позже, затем помечается ошибкой."""
+        explode.enqueue()
+        pk, = claim_tasks(1, 'test')
+        self.assertEqual(run_task(pk), Task.QUEUED)
+        failed = Task.objects.get(pk=pk)
+        self.assertGreater(failed.run_at, timezone.now())
+        self.assertIn('Ошибка задачи', failed.last_error)
+        self.assertEqual(claim_tasks(1, 'test'), [])
+        Task.objects.update(run_at=timezone.now())
+        pk, = claim_tasks(1, 'test')
+        self.assertEqual(run_task(pk), Task.FAILED)
+        self.assertEqual(Task.objects.get(pk=pk).attempts, 2)
+
+    def test_requeue_stale(self):
+        """Задача брошенного воркера возвращается в очередь."""
+        record.enqueue(1)
+        claim_tasks(1, 'test')
+        Task.objects.update(locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Task.objects.get().status, Task.QUEUED)
+
+    def test_requeue_stale_exhausted(self):
+        """Задача, исчерпавшая попытки на упавших воркерах, - ошибка."""
+        explode.enqueue()
+        for _ in range(2):
+            claim_tasks(1, 'test')
+            Task.objects.update(locked_at=timezone.now() - timedelta(days=1))
+            self.assertEqual(requeue_stale(), 1)
+        stale = Task.objects.get()
+        self.assertEqual(stale.status, Task.FAILED)
+        self.assertEqual(stale.attempts, 2)
+        self.assertIsNotNone(stale.finished)
+        self.assertTrue(stale.last_error)
+        self.assertEqual(claim_tasks(1, 'test'), [])
+
+    def test_log_failures(self):
+        """Ошибка пула вне run_task попадает в лог воркера."""
+        with ThreadPoolExecutor(1) as pool:
+            future = pool.submit(explode)
+            wait([future])
+        with self.assertLogs(
+                'tasks.management.commands.run_worker', 'ERROR') as logs:
+            log_failures({future: 7})
+        self.assertIn('#7', logs.output[0])
+        self.assertIn('Ошибка задачи', logs.output[0])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager(self):
+        """В режиме TASKS_EAGER задача выполняется сразу."""
+        record.enqueue(1)
+        self.assertEqual(CALLS, [1])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(
+        EMAIL_BACKEND='tasks.mail.QueuedEmailBackend',
+        TASKS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    )
+    def test_queued_email(self):
+        """Письмо отправляется воркером, а не во время запроса."""
+        mail.send_mail('Тема', 'Текст', 'from@example.com', ['to@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('run_worker', once=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Тема')
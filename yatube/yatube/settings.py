@@ -22,8 +22,11 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = 'a#6*^6y5r2==&u!4_4armu=(lj@@hm*+2zj@007=y)(!-t8$2v'
 
+# Профиль окружения: development или production
+YATUBE_PROFILE = os.getenv('YATUBE_PROFILE', 'development')
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = YATUBE_PROFILE != 'production'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -50,11 +53,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'tasks.apps.TasksConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,9 +67,19 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# Метрики запросов: Server-Timing и JSON-строки в лог core.middleware
+REQUEST_METRICS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 1.0,
+    'SLOW_REQUEST_MS': 500,
+}
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
@@ -97,6 +112,25 @@ DATABASES = {
     }
 }
 
+# PRAGMA для продакшена: WAL не блокирует чтение во время записи,
+# synchronous=NORMAL в режиме WAL не делает fsync на каждый коммит
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# PRAGMA, которые core выполняет на каждом новом подключении SQLite
+SQLITE_PRAGMAS = {}
+
+if YATUBE_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -154,7 +188,10 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 # Emulate mail server
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма отправляет воркер очереди задач бэкендом TASKS_EMAIL_BACKEND
+EMAIL_BACKEND = 'tasks.mail.QueuedEmailBackend'
+
+TASKS_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'send_mails')
 
@@ -169,3 +206,148 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+if YATUBE_PROFILE == 'production':
+    # Общий для всех воркеров кэш в файле SQLite и LRU процесса перед ним
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'LOCAL_TIMEOUT': 5,
+                'LOCAL_MAX_ENTRIES': 1000,
+            },
+        },
+        'shared': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 100_000,
+            },
+        },
+    }
+
+# Время жизни кэша фрагментов лент; сбрасывается сигналами при изменениях
+FEED_CACHE_TIMEOUT = 60 * 5
+
+# Время жизни версий и времени изменения областей лент. Ключи
+# заводятся и для случайных адресов, поэтому не хранятся вечно;
+# истёкшая версия заводится заново с новым значением
+FEED_STATE_TIMEOUT = 60 * 60 * 24
+
+# Пересчёт кэша без лавины (core.caching.get_or_compute): блокировка
+# на время вычисления, ожидание чужого результата, срок отдачи
+# устаревшего значения и коэффициент раннего обновления
+CACHE_COMPUTE = {
+    'LOCK_TIMEOUT': 10,
+    'WAIT_TIMEOUT': 3,
+    'STALE_TIMEOUT': 60,
+    'BETA': 1.0,
+}
+
+# Кэшировать число записей и id страниц лент до изменения их областей
+POSTS_QUERY_CACHE = True
+
+# Pagination
+
+# Курсорная (keyset) пагинация лент вместо нумерованных страниц
+POSTS_CURSOR_PAGINATION = False
+
+# До этого числа записей ленты считаются точно, дальше — оценка
+# планировщика или закэшированный COUNT(*)
+POSTS_EXACT_COUNT_LIMIT = 1000
+
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 5
+
+# Сколько страниц показывать по обе стороны от текущей
+POSTS_PAGE_WINDOW = 2
+
+# Follow feed
+
+# Материализованная лента подписок (posts.TimelineEntry)
+POSTS_FOLLOW_TIMELINE = True
+
+TIMELINE_BATCH_SIZE = 500
+
+# Thumbnails
+
+# Миниатюры создаёт воркер очереди задач после сохранения поста.
+# Воркер — отдельный процесс, поэтому только с общим кэшем production;
+# иначе миниатюры создаются сразу
+POSTS_THUMBNAIL_ASYNC = YATUBE_PROFILE == 'production'
+
+POSTS_THUMBNAIL_RETRY_TIMEOUT = 60 * 60
+
+POSTS_THUMBNAIL_PLACEHOLDER = 'posts/img/thumbnail-placeholder.svg'
+
+# Ширины вариантов миниатюр для srcset
+POSTS_THUMBNAIL_WIDTHS = (480, 720, 960)
+
+# Современные форматы вариантов в порядке предпочтения; создаются только
+# те, что умеют сохранять Pillow и sorl, JPEG остаётся запасным
+POSTS_THUMBNAIL_FORMATS = ('AVIF', 'WEBP')
+
+# Uploads
+
+# Загрузки всегда пишутся во временный файл, а не держатся в памяти
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+POSTS_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+POSTS_IMAGE_MAX_PIXELS = 50_000_000
+
+# Картинка поста вписывается в квадрат со стороной POSTS_IMAGE_MAX_SIDE
+POSTS_IMAGE_MAX_SIDE = 1920
+
+POSTS_IMAGE_QUALITY = 85
+
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # Сэкономленные на загрузках байты (posts.images.optimize_upload)
+        'posts.images': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Admin
+
+# Отфильтрованные списки админки считаются не дальше этого числа строк
+POSTS_ADMIN_COUNT_LIMIT = 10_000
+
+# Tasks
+
+# Выполнять задачи сразу при постановке, без воркера
+TASKS_EAGER = False
+
+TASKS_WORKERS = 4
+
+TASKS_POLL_INTERVAL = 1
+
+# Задержка перед первым повтором, удваивается с каждой попыткой
+TASKS_RETRY_DELAY = 10
+
+TASKS_RETRY_MAX_DELAY = 60 * 60
+
+# Задача, которая выполняется дольше, считается брошенной воркером
+TASKS_LOCK_TIMEOUT = 60 * 10
+
+TASKS_KEEP_FINISHED = 60 * 60 * 24